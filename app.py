@@ -209,13 +209,15 @@ def render_search_interface():
                             search_context = msg["content"]
                             break
 
-                # LLM統合検索を実行
+                # LLM統合検索を実行（LLMの回答は生成された部分から順に表示）
+                answer_container = st.chat_message("assistant", avatar="🤖")
                 result = search_with_llm(
                     query=query,
                     index_path=st.session_state.config.index_path,
                     top_k=5,
                     context=search_context,
-                    use_llm=None  # 設定から自動判断
+                    use_llm=None,  # 設定から自動判断
+                    stream_handler=answer_container.write_stream
                 )
 
                 if result.search_hits:
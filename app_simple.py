@@ -146,7 +146,8 @@ def render_chat():
                 snippet = extract_smart_snippet(
                     best_result.text, 
                     query,
-                    best_result.matched_terms
+                    best_result.matched_terms,
+                    text_lower=best_result.text_lower
                 )
                 
                 # 回答を構築
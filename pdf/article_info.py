@@ -0,0 +1,105 @@
+"""
+条文情報モジュール
+ページテキストから条文番号・条文タイプなどのページ固有の情報を抽出
+（インデックス作成時に列として保存し、検索時の再計算を省く）
+"""
+import re
+from typing import Optional, Tuple
+
+
+# 条文番号の文字列 → 数値
+ARTICLE_NUM_MAP = {
+    '１': 1, '２': 2, '３': 3, '４': 4, '５': 5,
+    '６': 6, '７': 7, '８': 8, '９': 9, '１０': 10,
+    '1': 1, '2': 2, '3': 3, '4': 4, '5': 5,
+    '6': 6, '7': 7, '8': 8, '9': 9, '10': 10,
+    '一': 1, '二': 2, '三': 3, '四': 4, '五': 5,
+    '六': 6, '七': 7, '八': 8, '九': 9, '十': 10,
+}
+
+# 条文番号のパターン（数字（全角・半角）、漢数字の順に探す）
+_ARTICLE_PATTERNS = (
+    re.compile(r'第([０-９0-9]{1,3})条'),
+    re.compile(r'第([一二三四五六七八九十]{1,3})条'),
+)
+
+# ページの特徴を表すビットフラグ
+PAGE_FLAG_PERIOD = 1  # 「期間」「日」「ヶ月」のいずれかを含む
+
+
+def extract_article_info(
+    text: str,
+    text_lower: Optional[str] = None
+) -> Tuple[Optional[int], str]:
+    """
+    テキストから条文番号と種類を抽出
+    
+    Args:
+        text: ページのテキスト
+        text_lower: 小文字化済みのテキスト（計算済みの場合。再度小文字化しない）
+    
+    Returns:
+        (条文番号, 条文タイプ)
+    """
+    article_num = None
+    # テキスト全体を探索（ただし最初の1000文字まで）
+    search_text = text[:1000]
+    
+    # 「第」を含まないページは条文番号がないため正規表現を実行しない
+    if '第' in search_text:
+        for pattern in _ARTICLE_PATTERNS:
+            matches = pattern.findall(search_text)
+            if matches:
+                article_str = matches[0]
+                
+                # 2桁以上の数字の処理
+                if article_str.isdigit():
+                    article_num = int(article_str)
+                else:
+                    article_num = ARTICLE_NUM_MAP.get(article_str, None)
+                    
+                    # 30番台、40番台などの処理
+                    if article_num is None and len(article_str) >= 2:
+                        try:
+                            article_num = int(article_str)
+                        except ValueError:
+                            article_num = 99  # デフォルト値
+                
+                if article_num:
+                    break
+    
+    # 条文のタイプを判定
+    if text_lower is not None:
+        text_preview = text_lower[:1000]
+    else:
+        text_preview = search_text.lower()
+    article_type = "general"
+    
+    # キーワードベースでタイプを判定
+    if '目的' in text_preview[:200]:
+        article_type = "目的"
+    elif '年次有給休暇' in text_preview or '有給休暇' in text_preview:
+        article_type = "休暇"  # 有給休暇関連
+    elif '育児休業' in text_preview or '介護休業' in text_preview:
+        article_type = "休業"  # 休業関連
+    elif '対象' in text_preview or 'できる' in text_preview:
+        article_type = "対象"
+    elif '手続' in text_preview or '申請' in text_preview or '申出' in text_preview:
+        article_type = "手続"
+    elif '期間' in text_preview:
+        article_type = "期間"
+    
+    return (article_num if article_num else None, article_type)
+
+
+def page_flags(text: str) -> int:
+    """
+    ページの特徴をビットフラグとして取得
+    
+    Returns:
+        PAGE_FLAG_* の論理和
+    """
+    flags = 0
+    if "期間" in text or "日" in text or "ヶ月" in text:
+        flags |= PAGE_FLAG_PERIOD
+    return flags
@@ -2,12 +2,102 @@
 インデックス管理モジュール
 SQLiteデータベースへのページデータの保存と取得
 """
+import atexit
+import re
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Iterable, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Set, Tuple, Optional
 from contextlib import contextmanager
 from loguru import logger
 from .ingest import PageRecord
+from .article_info import extract_article_info, page_flags
+
+
+# 検索用の読み取り専用接続キャッシュ（スレッドごと）
+_local = threading.local()
+
+# 検索用の接続を開くたびに登録するSQL関数（名前 → (引数の数, 関数)）
+_CONNECTION_FUNCTIONS: Dict[str, Tuple[int, Callable]] = {}
+
+# インデックスの世代（upsert_pagesで増やし、それ以前に開いた接続を無効にする）
+_generation = 0
+_generation_lock = threading.Lock()
+
+# 検索結果として取得する列
+PAGE_COLUMNS = ("file_name", "file_path", "page_no", "text", "section")
+
+# スコア計算用に小文字化済みの列を加えたもの
+SCORING_COLUMNS = PAGE_COLUMNS + ("text_lower", "section_lower")
+
+# インテリジェント検索のスコア計算用の列
+# 原文（text）は含めず、上位の結果のみfetch_page_textsで取得する
+INTELLIGENT_COLUMNS = (
+    "id", "file_name", "file_path", "page_no", "section",
+    "text_lower", "article_num", "article_type", "flags"
+)
+
+# 全件走査時に1回で取得する行数
+FETCH_BATCH_SIZE = 2048
+
+# FTS5で取得する候補ページ数の上限
+FTS_CANDIDATE_LIMIT = 50
+
+# 候補全体をあいまい一致で採点し直す検索（search_intelligentなど）向けの候補数上限
+# BM25の順位と最終スコアの相関が弱いため広めに取る
+FTS_RERANK_LIMIT = 200
+
+# BM25の列の重み（text, section）
+# セクション名は短く一致しやすいため、本文での一致を重視して候補を並べる
+FTS_BM25_WEIGHTS = (10.0, 2.0)
+
+# trigramトークナイザが扱える最短の語長
+FTS_MIN_TERM_LENGTH = 3
+
+# 検索語として扱う文字列（漢字・カタカナの連続、英数字の連続）
+_FTS_TERM_RE = re.compile(r'[\u4e00-\u9fff\u30a0-\u30ff]+|[a-zA-Z0-9]+')
+
+# ひらがな・カタカナ・CJK統合漢字・全角英数記号
+_CJK_RE = re.compile(r'[\u3040-\u309f\u30a0-\u30ff\u4e00-\u9fff\uff00-\uffef]')
+
+# 2文字の語（bigram）→ページの転置索引
+# trigramで扱えない2文字の語やFTS5が使えない環境で、LIKEの対象ページを絞り込む
+_BIGRAM_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS bigram_postings (
+    bigram TEXT NOT NULL,
+    page_id INTEGER NOT NULL,
+    PRIMARY KEY (bigram, page_id)
+) WITHOUT ROWID;
+"""
+
+# 全文検索用の仮想テーブルとpagesとの同期トリガー
+# trigramトークナイザにより日本語の部分文字列でも一致する（SQLite 3.34以降）
+_FTS_SCHEMA_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    text,
+    section,
+    content='pages',
+    content_rowid='id',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS pages_fts_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts(rowid, text, section)
+    VALUES (new.id, new.text, new.section);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pages_fts_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, text, section)
+    VALUES ('delete', old.id, old.text, old.section);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pages_fts_au AFTER UPDATE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, text, section)
+    VALUES ('delete', old.id, old.text, old.section);
+    INSERT INTO pages_fts(rowid, text, section)
+    VALUES (new.id, new.text, new.section);
+END;
+"""
 
 
 @contextmanager
@@ -37,6 +127,183 @@ def get_db_connection(index_path: Path):
             conn.close()
 
 
+def get_cached_connection(index_path: Path | str) -> sqlite3.Connection:
+    """
+    検索用の長寿命な読み取り専用接続を取得
+    
+    Args:
+        index_path: データベースファイルのパス
+    
+    Returns:
+        呼び出したスレッド内で共有される接続
+    
+    Raises:
+        FileNotFoundError: データベースが存在しない場合
+    
+    スレッドごとに初回のみ存在確認・接続を行い、以降はキャッシュを返す。
+    クエリごとのstat・open・スキーマ読み込みを省略できる。
+    upsert_pagesでインデックスを作り直した後は、各スレッドが次回の呼び出し時に
+    自分の接続を開き直す（他のスレッドが使用中の接続は閉じない）。
+    スキーマの更新は行わないため、列が不足している以前の形式のインデックスでは
+    不足している列をUDFによる式で代替する（column_sqlを参照）。
+    """
+    # 表記の異なる同じファイル（./data/index.sqliteとdata/index.sqliteなど）で
+    # 接続を共有するため、解決済みの絶対パスをキーにする
+    path = Path(index_path).resolve()
+    key = str(path)
+    connections = _thread_connections()
+    cached = connections.get(key)
+    if cached is not None:
+        generation, conn = cached
+        if generation == _generation:
+            return conn
+        # インデックスの再作成前に開いた接続は閉じて開き直す
+        del connections[key]
+        conn.close()
+    
+    if not path.exists():
+        raise FileNotFoundError(f"Index database not found: {path}")
+    
+    conn = sqlite3.connect(
+        f"{path.as_uri()}?mode=ro",
+        uri=True,
+        factory=_IndexConnection
+    )
+    conn.execute("PRAGMA mmap_size=268435456")  # 256MBまでメモリマップ
+    conn.execute("PRAGMA cache_size=-65536")    # 64MBのページキャッシュ
+    conn.column_exprs = _fallback_column_exprs(conn)
+    for name, (num_params, func) in _CONNECTION_FUNCTIONS.items():
+        conn.create_function(name, num_params, func, deterministic=True)
+    connections[key] = (_generation, conn)
+    logger.debug(f"Opened cached connection: {path}")
+    return conn
+
+
+def register_connection_function(name: str, num_params: int, func: Callable):
+    """
+    検索用の接続で使うSQL関数を登録
+    
+    Args:
+        name: SQLでの関数名
+        num_params: 引数の数
+        func: 決定的な関数（同じ引数には同じ値を返すこと）
+    
+    get_cached_connectionで接続を開くときに1回だけ登録されるため、
+    クエリのたびにcreate_functionを呼ぶ必要はない。
+    接続はスレッドごとに開かれるため、関数はスレッドセーフであること。
+    """
+    _CONNECTION_FUNCTIONS[name] = (num_params, func)
+
+
+class _IndexConnection(sqlite3.Connection):
+    """
+    検索用の読み取り専用接続
+    
+    column_exprsには、以前の形式のインデックスで不足している列の代替式を持つ
+    """
+    column_exprs: Dict[str, str] = {}
+
+
+# 不足している列の代替式（小文字化済みの列・条文情報の列を本文から計算する）
+_FALLBACK_COLUMN_EXPRS = {
+    "text_lower": "py_lower({prefix}text)",
+    "section_lower": "py_lower({prefix}section)",
+    "article_num": "py_article_num({prefix}text)",
+    "article_type": "py_article_type({prefix}text)",
+    "flags": "py_page_flags({prefix}text)",
+}
+
+
+def _fallback_column_exprs(db: sqlite3.Connection) -> Dict[str, str]:
+    """
+    pagesに存在しない列の代替式を求め、式が使うUDFを接続に登録
+    
+    Args:
+        db: データベース接続
+    
+    Returns:
+        列名 → 代替式（{prefix}にテーブル別名が入る）の辞書。列が揃っていれば空
+    """
+    columns = {row[1] for row in db.execute("PRAGMA table_info(pages)")}
+    exprs = {
+        column: expr for column, expr in _FALLBACK_COLUMN_EXPRS.items()
+        if column not in columns
+    }
+    if not exprs:
+        return {}
+    
+    db.create_function("py_lower", 1, _lower, deterministic=True)
+    db.create_function(
+        "py_article_num", 1, lambda text: _article_values(text)[0], deterministic=True
+    )
+    db.create_function(
+        "py_article_type", 1, lambda text: _article_values(text)[1], deterministic=True
+    )
+    db.create_function("py_page_flags", 1, page_flags, deterministic=True)
+    logger.warning(
+        f"Index is missing columns ({', '.join(exprs)}); computing them at query time. "
+        "Rebuild the index to store them."
+    )
+    return exprs
+
+
+def column_sql(db: sqlite3.Connection, column: str, prefix: str = "") -> str:
+    """
+    pagesの列を取得するためのSELECT句の式
+    
+    Args:
+        db: データベース接続
+        column: 列名
+        prefix: 列名の前に付けるテーブル別名（"p."など）
+    
+    Returns:
+        列が存在すれば列名、以前の形式のインデックスで不足していれば代替式
+    """
+    expr = getattr(db, "column_exprs", {}).get(column)
+    if expr is None:
+        return f"{prefix}{column}"
+    return expr.format(prefix=prefix)
+
+
+def _select_list(db: sqlite3.Connection, columns: Sequence[str], prefix: str = "") -> str:
+    """columnsを取得するSELECT句の列リスト"""
+    return ", ".join(column_sql(db, column, prefix) for column in columns)
+
+
+def _thread_connections() -> Dict[str, Tuple[int, sqlite3.Connection]]:
+    """呼び出したスレッドの接続キャッシュ（パス → (世代, 接続)）"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    return connections
+
+
+def invalidate_cached_connections():
+    """
+    キャッシュ済みの接続を無効にする
+    
+    インデックスの再作成後に呼び出す。各スレッドは次回の
+    get_cached_connectionで自分の接続を閉じて開き直す。
+    """
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+def close_cached_connections():
+    """
+    呼び出したスレッドのキャッシュ済みの接続をすべて閉じる
+    """
+    connections = _thread_connections()
+    while connections:
+        _, (_, conn) = connections.popitem()
+        conn.close()
+
+
+# プロセス終了時にメインスレッドのキャッシュ済みの接続を閉じる
+atexit.register(close_cached_connections)
+
+
 def ensure_schema(db: sqlite3.Connection):
     """
     データベーススキーマを作成
@@ -58,6 +325,11 @@ def ensure_schema(db: sqlite3.Connection):
         page_no INTEGER NOT NULL,              -- ページ番号
         text TEXT NOT NULL,                    -- 抽出したテキスト
         section TEXT,                          -- セクション名（NULL可）
+        text_lower TEXT,                       -- 小文字化したテキスト（検索用）
+        section_lower TEXT,                    -- 小文字化したセクション名（検索用）
+        article_num INTEGER,                   -- 条文番号（NULL可）
+        article_type TEXT,                     -- 条文タイプ
+        flags INTEGER,                         -- ページの特徴（article_info.PAGE_FLAG_*）
         created_at TEXT DEFAULT CURRENT_TIMESTAMP,  -- 作成日時
         UNIQUE(file_name, page_no)             -- ファイル名とページ番号の組み合わせは一意
     );
@@ -81,6 +353,153 @@ def ensure_schema(db: sqlite3.Connection):
     except Exception as e:
         logger.error(f"Failed to create schema: {e}")
         raise
+    
+    ensure_lower_columns(db)
+    ensure_article_columns(db)
+    ensure_fts_schema(db)
+    ensure_bigram_postings(db)
+
+
+def _lower(value: Optional[str]) -> Optional[str]:
+    """Pythonのstr.lowerと同じ規則で小文字化（NULLはそのまま）"""
+    return value.lower() if value is not None else None
+
+
+def ensure_lower_columns(db: sqlite3.Connection):
+    """
+    小文字化済みの列（text_lower, section_lower）を追加
+    
+    Args:
+        db: データベース接続
+    
+    列のない既存のデータベースには列を追加し、既存ページの値を埋める。
+    SQLiteのlower()はASCIIしか変換しないため、Pythonの関数で計算する。
+    """
+    columns = {row[1] for row in db.execute("PRAGMA table_info(pages)")}
+    missing = [c for c in ("text_lower", "section_lower") if c not in columns]
+    if not missing:
+        return
+    
+    for column in missing:
+        db.execute(f"ALTER TABLE pages ADD COLUMN {column} TEXT")
+    db.create_function("py_lower", 1, _lower, deterministic=True)
+    db.execute("UPDATE pages SET text_lower = py_lower(text), section_lower = py_lower(section)")
+    db.commit()
+    logger.info(f"Added lowercase columns to pages: {', '.join(missing)}")
+
+
+def _article_values(
+    text: str,
+    text_lower: Optional[str] = None
+) -> Tuple[Optional[int], str, int]:
+    """ページの (article_num, article_type, flags) を計算"""
+    article_num, article_type = extract_article_info(text, text_lower)
+    return article_num, article_type, page_flags(text)
+
+
+def ensure_article_columns(db: sqlite3.Connection):
+    """
+    条文情報の列（article_num, article_type, flags）を追加
+    
+    Args:
+        db: データベース接続
+    
+    列のない既存のデータベースには列を追加し、既存ページの値を埋める。
+    """
+    columns = {row[1] for row in db.execute("PRAGMA table_info(pages)")}
+    missing = [c for c in ("article_num", "article_type", "flags") if c not in columns]
+    if not missing:
+        return
+    
+    types = {"article_num": "INTEGER", "article_type": "TEXT", "flags": "INTEGER"}
+    for column in missing:
+        db.execute(f"ALTER TABLE pages ADD COLUMN {column} {types[column]}")
+    rows = db.execute("SELECT id, text, text_lower FROM pages").fetchall()
+    db.executemany(
+        "UPDATE pages SET article_num = ?, article_type = ?, flags = ? WHERE id = ?",
+        [(*_article_values(text, text_lower), page_id) for page_id, text, text_lower in rows]
+    )
+    db.commit()
+    logger.info(f"Added article columns to pages: {', '.join(missing)}")
+
+
+def ensure_fts_schema(db: sqlite3.Connection):
+    """
+    全文検索（FTS5）用のテーブルとトリガーを作成
+    
+    Args:
+        db: データベース接続
+    
+    既存のデータベースに後から作成した場合は、既存ページから索引を再構築する。
+    FTS5/trigramが使えない環境では警告のみ出し、検索側は全件走査で動作する。
+    """
+    existed = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'pages_fts'"
+    ).fetchone()
+    
+    try:
+        db.executescript(_FTS_SCHEMA_SQL)
+        if not existed:
+            db.execute("INSERT INTO pages_fts(pages_fts) VALUES ('rebuild')")
+        db.commit()
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 is not available, falling back to full scan: {e}")
+
+
+def page_bigrams(*texts: Optional[str]) -> Set[str]:
+    """
+    テキスト中の検索語になりうる文字の連続から2文字の組（bigram）を抽出
+    
+    Args:
+        texts: 小文字化済みのテキスト（本文・セクション名。Noneは無視）
+    
+    Returns:
+        bigramの集合
+    
+    検索語は_FTS_TERM_REの連続から取り出すため、その内側の組のみを対象にする。
+    """
+    bigrams: Set[str] = set()
+    for text in texts:
+        if not text:
+            continue
+        for run in _FTS_TERM_RE.findall(text):
+            bigrams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return bigrams
+
+
+def _insert_bigram_postings(db: sqlite3.Connection):
+    """pagesの全行からbigram_postingsを作り直す"""
+    db.execute("DELETE FROM bigram_postings")
+    rows = db.execute("SELECT id, text_lower, section_lower FROM pages")
+    db.executemany(
+        "INSERT INTO bigram_postings (bigram, page_id) VALUES (?, ?)",
+        (
+            (bigram, page_id)
+            for page_id, text_lower, section_lower in rows.fetchall()
+            for bigram in page_bigrams(text_lower, section_lower)
+        )
+    )
+
+
+def ensure_bigram_postings(db: sqlite3.Connection):
+    """
+    bigramの転置索引（bigram_postings）を作成
+    
+    Args:
+        db: データベース接続
+    
+    既存のデータベースに後から作成した場合は、既存ページから索引を構築する。
+    """
+    existed = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'bigram_postings'"
+    ).fetchone()
+    if existed:
+        return
+    
+    db.executescript(_BIGRAM_SCHEMA_SQL)
+    _insert_bigram_postings(db)
+    db.commit()
+    logger.info("Built bigram postings for existing pages")
 
 
 def upsert_pages(index_path: Path, pages: Iterable[PageRecord]):
@@ -111,19 +530,28 @@ def upsert_pages(index_path: Path, pages: Iterable[PageRecord]):
             
             # バッチ挿入（高速化のため）
             insert_sql = """
-            INSERT INTO pages (file_name, file_path, page_no, text, section)
-            VALUES (?, ?, ?, ?, ?)
+            INSERT INTO pages (
+                file_name, file_path, page_no, text, section, text_lower, section_lower,
+                article_num, article_type, flags
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """
             
-            # データを準備
-            data = [
-                (p.file_name, p.file_path, p.page_no, p.text, p.section)
-                for p in pages
-            ]
+            # データを準備（検索時に再計算しなくて済むよう小文字版と条文情報も保存）
+            data = []
+            for p in pages:
+                text_lower = p.text.lower()
+                data.append((
+                    p.file_name, p.file_path, p.page_no, p.text, p.section,
+                    text_lower, _lower(p.section), *_article_values(p.text, text_lower)
+                ))
             
             # バッチ実行
             cursor.executemany(insert_sql, data)
             
+            # 短い語の候補絞り込み用の転置索引を作り直す
+            _insert_bigram_postings(db)
+            
             # メタデータを更新
             cursor.execute("""
                 INSERT OR REPLACE INTO metadata (key, value)
@@ -139,9 +567,12 @@ def upsert_pages(index_path: Path, pages: Iterable[PageRecord]):
             db.rollback()
             logger.error(f"Failed to upsert pages: {e}")
             raise
+    
+    # 検索用の接続は各スレッドが次回アクセス時に開き直す
+    invalidate_cached_connections()
 
 
-def get_all_pages(index_path: Path) -> List[Tuple]:
+def get_all_pages(index_path: Path | str) -> List[Tuple]:
     """
     データベースから全ページを取得
     
@@ -151,19 +582,285 @@ def get_all_pages(index_path: Path) -> List[Tuple]:
     Returns:
         ページデータのタプルのリスト
     """
-    pages = []
+    db = get_cached_connection(index_path)
+    cursor = db.execute("""
+        SELECT file_name, page_no, text, section, file_path
+        FROM pages
+        ORDER BY file_name, page_no
+    """)
     
-    with get_db_connection(index_path) as db:
-        cursor = db.execute("""
-            SELECT file_name, page_no, text, section, file_path
-            FROM pages
-            ORDER BY file_name, page_no
-        """)
-        
-        for row in cursor:
-            pages.append(tuple(row))
+    return cursor.fetchall()
+
+
+def iter_page_batches(
+    db: sqlite3.Connection,
+    columns: Sequence[str] = PAGE_COLUMNS,
+    batch_size: int = FETCH_BATCH_SIZE,
+    file_filters: Sequence[str] = ()
+) -> Iterator[List[Tuple]]:
+    """
+    pagesの全行をバッチ単位で取得
+    
+    Args:
+        db: データベース接続
+        columns: 取得する列
+        batch_size: 1バッチの行数
+        file_filters: ファイル名の部分文字列（指定した場合はいずれかを含むページのみ）
+    
+    Yields:
+        columnsの順のタプルのリスト
+    
+    1行ずつのイテレーションではなくfetchmanyでまとめて取得し、
+    Python↔Cの往復を減らす。呼び出し側はバッチ単位で一括スコア計算できる。
+    """
+    file_condition, file_params = _file_filter_sql(file_filters)
+    where = f" WHERE {file_condition}" if file_condition else ""
+    cursor = db.execute(f"SELECT {_select_list(db, columns)} FROM pages{where}", file_params)
+    cursor.arraysize = batch_size
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        yield rows
+
+
+def fetch_page_texts(db: sqlite3.Connection, page_ids: Sequence[int]) -> Dict[int, str]:
+    """
+    指定したページの原文を取得
+    
+    Args:
+        db: データベース接続
+        page_ids: pagesのid
+    
+    Returns:
+        id → text の辞書
+    """
+    if not page_ids:
+        return {}
+    placeholders = ", ".join("?" * len(page_ids))
+    return dict(db.execute(
+        f"SELECT id, text FROM pages WHERE id IN ({placeholders})", list(page_ids)
+    ))
+
+
+def candidate_batches(
+    db: sqlite3.Connection,
+    queries: Iterable[str],
+    columns: Sequence[str] = SCORING_COLUMNS,
+    limit: int = FTS_CANDIDATE_LIMIT,
+    file_filters: Sequence[str] = ()
+) -> Iterator[List[Tuple]]:
+    """
+    スコア計算の対象ページをバッチ単位で取得
+    
+    Args:
+        db: データベース接続
+        queries: 検索クエリ（拡張クエリやキーワードを含む）
+        columns: 取得する列
+        limit: FTS5で取得する候補数の上限
+        file_filters: ファイル名の部分文字列（指定した場合はいずれかを含むページのみ）
+    
+    Yields:
+        columnsの順のタプルのリスト
+    
+    FTS5で候補を絞り込めた場合はその候補を1バッチとして返し、
+    使えない場合は全件をiter_page_batchesで返す。
+    ファイル名の絞り込みはSQL側で行うため、候補数の上限は絞り込み後に適用される。
+    """
+    rows = fts_candidates(db, queries, limit, columns, file_filters)
+    if rows is not None:
+        yield rows
+    else:
+        yield from iter_page_batches(db, columns, file_filters=file_filters)
+
+
+def _file_filter_sql(file_filters: Sequence[str], prefix: str = "") -> Tuple[str, List[str]]:
+    """
+    ファイル名の部分文字列による絞り込み条件
+    
+    Args:
+        file_filters: ファイル名の部分文字列（空なら絞り込まない）
+        prefix: 列名の前に付けるテーブル別名（"p."など）
+    
+    Returns:
+        (SQLの条件式, パラメータ)。絞り込まない場合は ("", [])
+    
+    instrはPythonの`in`と同じく大文字小文字を区別した部分文字列の判定になる。
+    """
+    if not file_filters:
+        return "", []
+    condition = " OR ".join([f"instr({prefix}file_name, ?) > 0"] * len(file_filters))
+    return f"({condition})", list(file_filters)
+
+
+def _contains_cjk(text: str) -> bool:
+    """日本語（CJK）の文字を含むか判定"""
+    return _CJK_RE.search(text) is not None
+
+
+def _split_terms(queries: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    検索クエリから語を抽出し、trigramで扱える語とそれ未満の短い語に分ける
+    """
+    long_terms: List[str] = []
+    short_terms: List[str] = []
+    for query in queries:
+        for term in _FTS_TERM_RE.findall(query.lower()):
+            terms = long_terms if len(term) >= FTS_MIN_TERM_LENGTH else short_terms
+            if term not in terms:
+                terms.append(term)
+    return long_terms, short_terms
+
+
+def build_fts_query(queries: Iterable[str]) -> Optional[str]:
+    """
+    検索クエリからFTS5のMATCH式を作成
+    
+    Args:
+        queries: 検索クエリ（拡張クエリやキーワードを含む）
+    
+    Returns:
+        各語をフレーズとしてORで連結した式（使える語がない場合はNone）
+    
+    trigramトークナイザは3文字未満の語に一致できないため、短い語は除外する。
+    同義語展開した語もここでORに含まれる（例: "育児休業" OR "育児休暇"）。
+    """
+    terms, _ = _split_terms(queries)
+    if not terms:
+        return None
+    
+    return _to_match_expr(terms)
+
+
+def _to_match_expr(terms: List[str]) -> str:
+    """語をフレーズとしてORで連結したMATCH式を作成"""
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def fts_candidates(
+    db: sqlite3.Connection,
+    queries: Iterable[str],
+    limit: int = FTS_CANDIDATE_LIMIT,
+    columns: Sequence[str] = PAGE_COLUMNS,
+    file_filters: Sequence[str] = ()
+) -> Optional[List[Tuple]]:
+    """
+    FTS5の索引から候補ページを取得
+    
+    Args:
+        db: データベース接続
+        queries: 検索クエリ（拡張クエリやキーワードを含む）
+        limit: MATCHで取得する最大件数（file_filtersによる絞り込み後に適用）
+        columns: 取得するpagesの列（SCORING_COLUMNSで小文字化済みの列も取得）
+        file_filters: ファイル名の部分文字列（指定した場合はいずれかを含むページのみ）
+    
+    Returns:
+        columnsの順のタプル（既定は (file_name, file_path, page_no, text, section)）のリスト。
+        FTS5が使えない場合や検索語を抽出できない場合はNone
+    
+    3文字以上の語があればMATCHでBM25順（列の重みはFTS_BM25_WEIGHTS）に取得する。
+    1〜2文字の語（「育休」「時短」など）はtrigramで一致できないため、
+    LIKEによる部分一致で取得し、MATCHの候補の後ろに加える（limitはMATCHにのみ適用）。
+    日本語のクエリでMATCHが0件の場合も、短い語を含めてLIKEで再検索する。
+    呼び出し側はNoneの場合に全件走査へフォールバックし、
+    候補に対してのみPythonのスコア計算を行う。
+    """
+    queries = list(queries)
+    long_terms, short_terms = _split_terms(queries)
+    
+    if not long_terms:
+        if not short_terms:
+            return None
+        return _like_candidates(db, short_terms, columns, file_filters)
+    
+    match = _to_match_expr(long_terms)
+    select = _select_list(db, columns, "p.")
+    weights = ", ".join(str(w) for w in FTS_BM25_WEIGHTS)
+    file_condition, file_params = _file_filter_sql(file_filters, "p.")
+    if file_condition:
+        file_condition = f"AND {file_condition}"
+    
+    try:
+        cursor = db.execute(f"""
+            SELECT {select}
+            FROM pages_fts
+            JOIN pages p ON p.id = pages_fts.rowid
+            WHERE pages_fts MATCH ? {file_condition}
+            ORDER BY bm25(pages_fts, {weights})
+            LIMIT ?
+        """, (match, *file_params, limit))
+        rows = cursor.fetchall()
+    except sqlite3.OperationalError as e:
+        logger.debug(f"FTS search unavailable: {e}")
+        # bigram索引で絞り込めるならLIKEで代替する
+        if all(len(term) >= 2 for term in long_terms + short_terms):
+            return _like_candidates(db, long_terms + short_terms, columns, file_filters)
+        return None
+    
+    if not rows and any(_contains_cjk(q) for q in queries):
+        logger.debug("FTS returned no rows, retrying with LIKE")
+        return _like_candidates(db, long_terms + short_terms, columns, file_filters)
+    
+    if short_terms:
+        # 短い語のみを含むページはMATCHで取得できないため、LIKEの結果を後ろに加える
+        seen = set(rows)
+        rows.extend(
+            row for row in _like_candidates(db, short_terms, columns, file_filters)
+            if row not in seen
+        )
+    
+    return rows
+
+
+def _like_candidates(
+    db: sqlite3.Connection,
+    terms: List[str],
+    columns: Sequence[str] = PAGE_COLUMNS,
+    file_filters: Sequence[str] = ()
+) -> List[Tuple]:
+    """
+    LIKEによる部分一致で候補ページを取得
+    
+    検索語は漢字・カナ・英数字のみのため、LIKEのエスケープは不要。
+    全語が2文字以上ならbigram_postingsで「語のbigramをすべて含むページ」に
+    絞り込んでからLIKEを評価する（結果は全件のLIKEと同じ）。
+    """
+    conditions = " OR ".join(["text LIKE ? OR section LIKE ?"] * len(terms))
+    params = [f"%{term}%" for term in terms for _ in range(2)]
+    file_condition, file_params = _file_filter_sql(file_filters)
+    if file_condition:
+        conditions = f"({conditions}) AND {file_condition}"
+        params += file_params
+    
+    if all(len(term) >= 2 for term in terms):
+        # 語ごとに「bigramをすべて含むページ」を求め、その和集合を候補にする
+        subqueries = []
+        bigram_params: List = []
+        for term in terms:
+            bigrams = page_bigrams(term)
+            subqueries.append(
+                "SELECT page_id FROM bigram_postings "
+                f"WHERE bigram IN ({', '.join('?' * len(bigrams))}) "
+                "GROUP BY page_id HAVING COUNT(*) = ?"
+            )
+            bigram_params.extend(bigrams)
+            bigram_params.append(len(bigrams))
+        try:
+            cursor = db.execute(
+                f"SELECT {_select_list(db, columns)} FROM pages "
+                f"WHERE id IN ({' UNION '.join(subqueries)}) AND ({conditions}) "
+                "ORDER BY id",
+                bigram_params + params
+            )
+            return cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Bigram postings unavailable: {e}")
     
-    return pages
+    cursor = db.execute(
+        f"SELECT {_select_list(db, columns)} FROM pages WHERE {conditions}",
+        params
+    )
+    return cursor.fetchall()
 
 
 def search_pages(
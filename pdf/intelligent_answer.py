@@ -3,10 +3,33 @@
 実際のPDF内容を解析して適切な回答を生成
 """
 from typing import List, Optional, Dict, Any
+import heapq
 import re
 from loguru import logger
 
 
+# トピック判定用キーワード（定義順が優先度）
+_TOPIC_KEYWORDS = {
+    "育児休業": ["育児", "育休", "産休", "子育て", "出産"],
+    "有給休暇": ["有給", "有休", "年休", "年次休暇"],
+    "労働時間": ["労働時間", "勤務時間", "残業", "時間外", "所定"],
+    "給与": ["給与", "給料", "賃金", "締日", "支払日", "賞与"],
+    "退職": ["退職", "辞職", "離職", "退社"],
+}
+
+# キーワード → (優先度, トピック) の逆引き
+_KW_TO_TOPIC = {
+    kw: (priority, topic)
+    for priority, (topic, keywords) in enumerate(_TOPIC_KEYWORDS.items())
+    for kw in keywords
+}
+
+# 全キーワードを1回で走査するパターン（先読みで重なった出現も拾う）
+_TOPIC_KW_RE = re.compile(
+    "(?=(" + "|".join(re.escape(kw) for kw in _KW_TO_TOPIC) + "))"
+)
+
+
 class IntelligentAnswerGenerator:
     """
     PDF内容から知的な回答を生成するクラス
@@ -90,21 +113,12 @@ class IntelligentAnswerGenerator:
         Returns:
             特定されたトピック
         """
-        query_lower = query.lower()
+        matches = _TOPIC_KW_RE.findall(query.lower())
+        if not matches:
+            return None
         
-        topic_keywords = {
-            "育児休業": ["育児", "育休", "産休", "子育て", "出産"],
-            "有給休暇": ["有給", "有休", "年休", "年次休暇"],
-            "労働時間": ["労働時間", "勤務時間", "残業", "時間外", "所定"],
-            "給与": ["給与", "給料", "賃金", "締日", "支払日", "賞与"],
-            "退職": ["退職", "辞職", "離職", "退社"],
-        }
-        
-        for topic, keywords in topic_keywords.items():
-            if any(kw in query_lower for kw in keywords):
-                return topic
-        
-        return None
+        # 複数トピックに該当する場合は定義順で優先
+        return min(_KW_TO_TOPIC[kw] for kw in matches)[1]
     
     def analyze_negative_query(self, query: str, text: str) -> Dict[str, List[str]]:
         """
@@ -294,22 +308,21 @@ class IntelligentAnswerGenerator:
         
         # 関連度の高い文を抽出
         scored_sentences = []
-        for sentence in sentences[:20]:  # 最初の20文をチェック
+        for idx, sentence in enumerate(sentences[:20]):  # 最初の20文をチェック
             score = 0
             for keyword in keywords:
                 if keyword in sentence:
                     score += 1
             if score > 0:
-                scored_sentences.append((score, sentence))
-        
-        # スコア順にソート
-        scored_sentences.sort(key=lambda x: x[0], reverse=True)
+                # 文の出現位置（分割時のインデックス）も保持しておく
+                scored_sentences.append((score, idx, sentence))
         
         if scored_sentences:
-            # 最も関連度の高い2-3文を選択
-            result_sentences = [s[1] for s in scored_sentences[:3]]
-            # 元のテキストでの出現順に並べ替え
-            result_sentences.sort(key=lambda s: text.find(s))
+            # 最も関連度の高い2-3文を選択（全体をソートせず上位のみ取得）
+            top_sentences = heapq.nlargest(3, scored_sentences, key=lambda x: x[0])
+            # 元のテキストでの出現順に並べ替え（text.findによる再走査は不要）
+            top_sentences.sort(key=lambda x: x[1])
+            result_sentences = [s[2] for s in top_sentences]
             return "。".join(result_sentences) + "。"
         else:
             # 関連文が見つからない場合は、規程の主要部分を抽出
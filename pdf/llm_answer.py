@@ -2,13 +2,14 @@
 LLM（OpenAI）を使用した回答生成モジュール
 検索結果を基にLLMで自然な回答を生成
 """
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 import os
 from loguru import logger
 import openai
 from openai import OpenAI
 from core.config import AppConfig
+from .search import SearchHit
 
 
 @dataclass
@@ -19,6 +20,33 @@ class LLMConfig:
     model: str = "gpt-4o-mini"
     temperature: float = 0.3
     max_tokens: int = 1000
+    timeout: float = 30.0
+    max_retries: int = 2
+
+
+def _as_fields(result: Any) -> Tuple[str, str, int, Optional[str]]:
+    """
+    検索結果を (text, file_name, page_no, section) のタプルに正規化
+
+    上流は常にSearchHitを返すため、その場合は属性を直接参照する。
+    辞書形式の結果も互換のため受け付ける。
+    """
+    if isinstance(result, SearchHit):
+        return result.text, result.file_name, result.page_no, result.section
+    if isinstance(result, dict):
+        return (
+            result.get('text', ''),
+            result.get('file_name', ''),
+            result.get('page_no', 0),
+            result.get('section', '')
+        )
+    # SearchHit互換オブジェクト
+    return (
+        getattr(result, 'text', ''),
+        getattr(result, 'file_name', ''),
+        getattr(result, 'page_no', 0),
+        getattr(result, 'section', '')
+    )
 
 
 class LLMAnswerGenerator:
@@ -54,8 +82,13 @@ class LLMAnswerGenerator:
         self.enabled = True
 
         # OpenAIクライアントを初期化
+        # クライアント内部のHTTP接続プールはインスタンス共有により再利用される
         if config.provider == "openai":
-            self.client = OpenAI(api_key=config.api_key)
+            self.client = OpenAI(
+                api_key=config.api_key,
+                timeout=config.timeout,
+                max_retries=config.max_retries
+            )
         else:
             raise ValueError(f"Unsupported provider: {config.provider}")
 
@@ -102,6 +135,49 @@ class LLMAnswerGenerator:
             # エラー時はフォールバック
             return self._generate_simple_answer(query, search_results)
 
+    def generate_answer_stream(
+        self,
+        query: str,
+        search_results: List[Dict[str, Any]],
+        context: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        LLMを使用して回答をストリーミング生成
+
+        Args:
+            query: ユーザーのクエリ
+            search_results: 検索結果のリスト
+            context: 前の会話の文脈
+
+        Yields:
+            生成された回答の断片（連結すると回答全体になる）
+
+        Raises:
+            Exception: 断片を出力した後にLLMのエラーが発生した場合
+                （出力開始前のエラーは簡易的な回答にフォールバックする）
+        """
+        if not self.enabled or not search_results:
+            yield self.generate_answer(query, search_results, context)
+            return
+
+        started = False
+        try:
+            context_info = self._prepare_context(search_results)
+            prompt = self._build_prompt(query, context_info, context)
+
+            for chunk in self._stream_llm(prompt):
+                started = True
+                yield chunk
+
+        except Exception as e:
+            logger.error(f"LLM error: {e}")
+            # 出力開始前のエラーのみフォールバック
+            if not started:
+                yield self._generate_simple_answer(query, search_results)
+                return
+            # 途中までの回答は不完全なため、呼び出し側でエラーとして扱う
+            raise
+
     def _prepare_context(self, search_results: List[Dict[str, Any]]) -> str:
         """
         検索結果から文脈情報を準備
@@ -115,11 +191,7 @@ class LLMAnswerGenerator:
         context_parts = []
 
         for i, result in enumerate(search_results[:3], 1):  # 上位3件を使用
-            # SearchHitオブジェクトの属性を取得
-            text = result.text if hasattr(result, 'text') else result.get('text', '')
-            file_name = result.file_name if hasattr(result, 'file_name') else result.get('file_name', '')
-            page_no = result.page_no if hasattr(result, 'page_no') else result.get('page_no', 0)
-            section = result.section if hasattr(result, 'section') else result.get('section', '')
+            text, file_name, page_no, section = _as_fields(result)
 
             # 文脈を構築
             context_parts.append(f"【参照{i}】")
@@ -203,6 +275,38 @@ class LLMAnswerGenerator:
             logger.error(f"OpenAI API error: {e}")
             raise
 
+    def _stream_llm(self, prompt: tuple) -> Iterator[str]:
+        """
+        LLM APIをストリーミングモードで呼び出す
+
+        Args:
+            prompt: (system_prompt, user_prompt)のタプル
+
+        Yields:
+            生成されたテキストの断片
+        """
+        system_prompt, user_prompt = prompt
+
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.config.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=self.config.temperature,
+                max_tokens=self.config.max_tokens,
+                stream=True
+            )
+
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            raise
+
     def _generate_simple_answer(
         self,
         query: str,
@@ -224,9 +328,7 @@ class LLMAnswerGenerator:
         # 最も関連性の高い結果を取得
         best_result = search_results[0]
 
-        text = best_result.text if hasattr(best_result, 'text') else best_result.get('text', '')
-        file_name = best_result.file_name if hasattr(best_result, 'file_name') else best_result.get('file_name', '')
-        page_no = best_result.page_no if hasattr(best_result, 'page_no') else best_result.get('page_no', 0)
+        text, file_name, page_no, _ = _as_fields(best_result)
 
         # テキストの最初の200文字を抽出
         summary = text[:200] + "..." if len(text) > 200 else text
@@ -285,4 +387,36 @@ def generate_llm_answer(
         return generate_intelligent_answer(query, search_results, context)
 
     # LLMで回答を生成
-    return generator.generate_answer(query, search_results, context)
\ No newline at end of file
+    return generator.generate_answer(query, search_results, context)
+
+
+def stream_llm_answer(
+    query: str,
+    search_results: List[Any],
+    context: Optional[str] = None
+) -> Iterator[str]:
+    """
+    LLMを使用して回答をストリーミング生成（エントリーポイント）
+
+    最初のトークンが届いた時点から表示できるため、体感待ち時間が短くなる。
+    LLMが利用できない場合は既存の実装による回答を1回で返す。
+
+    Args:
+        query: ユーザーのクエリ
+        search_results: 検索結果のリスト
+        context: 前の会話の文脈
+
+    Yields:
+        回答の断片
+
+    Raises:
+        Exception: 回答の途中でLLMのエラーが発生した場合
+    """
+    generator = get_llm_generator()
+
+    if generator is None or not generator.enabled:
+        from pdf.intelligent_answer import generate_intelligent_answer
+        yield generate_intelligent_answer(query, search_results, context)
+        return
+
+    yield from generator.generate_answer_stream(query, search_results, context)
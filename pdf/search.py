@@ -5,13 +5,14 @@ rapidfuzzを使用した類似度検索とスコアリング
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Optional, Tuple
+import heapq
 import re
 from rapidfuzz import fuzz
 from loguru import logger
 from .index import get_all_pages
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchHit:
     """
     検索結果を保持するデータクラス
@@ -102,18 +103,33 @@ def calculate_score(
     4. 完全一致ボーナス: 完全一致する場合+20
     5. 類義語ボーナス: 類義語が含まれる場合のボーナス
     """
-    # 正規化
-    query_norm = normalize_text(query)
-    text_norm = normalize_text(text)
+    return _score_normalized(
+        normalize_text(query),
+        normalize_text(text),
+        normalize_text(section) if section else None,
+        [normalize_text(k) for k in boost_keywords] if boost_keywords else None
+    )
+
+
+def _score_normalized(
+    query_norm: str,
+    text_norm: str,
+    section_norm: Optional[str],
+    keyword_norms: Optional[List[str]]
+) -> float:
+    """
+    正規化済みの値からスコアを計算
     
+    クエリ・キーワードの正規化を呼び出し側で1回にまとめるための内部関数。
+    アルゴリズムはcalculate_scoreと同一。
+    """
     # 基本スコア（部分一致度）
     # partial_ratio: 部分文字列の一致度を計算
     base_score = fuzz.partial_ratio(query_norm, text_norm)
     
     # セクションボーナス
     section_bonus = 0
-    if section:
-        section_norm = normalize_text(section)
+    if section_norm is not None:
         if query_norm in section_norm:
             section_bonus = 15
         elif fuzz.partial_ratio(query_norm, section_norm) > 80:
@@ -121,9 +137,8 @@ def calculate_score(
     
     # キーワードボーナス（類義語を含む）
     keyword_bonus = 0
-    if boost_keywords:
-        for keyword in boost_keywords:
-            keyword_norm = normalize_text(keyword)
+    if keyword_norms:
+        for keyword_norm in keyword_norms:
             if keyword_norm in text_norm:
                 # 元のクエリから抽出された単語の場合は高いボーナス
                 if keyword_norm in query_norm:
@@ -148,9 +163,8 @@ def calculate_score(
             position_bonus = 5
     
     # 類義語に対する位置ボーナス
-    if boost_keywords and position_bonus == 0:
-        for keyword in boost_keywords:
-            keyword_norm = normalize_text(keyword)
+    if keyword_norms and position_bonus == 0:
+        for keyword_norm in keyword_norms:
             pos = text_norm.find(keyword_norm)
             if pos >= 0:
                 if pos < len(text_norm) * 0.25:
@@ -164,6 +178,44 @@ def calculate_score(
     return min(total_score, 150)  # 最大150点
 
 
+# 類義語辞書（簡易版）
+_SYNONYM_MAP = {
+    '時間外労働': ('時間外勤務', '残業', 'オーバータイム'),
+    '時間外勤務': ('時間外労働', '残業', 'オーバータイム'),
+    '残業': ('時間外労働', '時間外勤務', 'オーバータイム'),
+    '給与': ('給料', '賃金', '報酬', 'サラリー'),
+    '給料': ('給与', '賃金', '報酬', 'サラリー'),
+    '休暇': ('休み', '休日', 'ホリデー'),
+    '育児': ('子育て', 'チャイルドケア'),
+    '勤務': ('労働', '仕事', 'ワーク'),
+    '労働': ('勤務', '仕事', 'ワーク'),
+}
+
+# 元の単語を含めた類義語タプル（展開時は辞書引き1回で済む）
+_ALL_SYNONYMS = {
+    word: (word,) + synonyms for word, synonyms in _SYNONYM_MAP.items()
+}
+
+# ストップワード（除外する単語）
+_STOPWORDS = frozenset({
+    'の', 'は', 'が', 'を', 'に', 'で', 'と', 'から', 'まで',
+    'について', 'に関して', 'とは', 'って', 'です', 'ます', '教えて',
+    '？', '?', '条件', 'ください', '教えてください', '知りたい',
+    '教える', 'おしえて', '教えて下さい'
+})
+
+# 助詞と区切り文字をまとめて1回で分割するパターン
+_PARTICLE_SPLIT = re.compile(r'について|に関して|とは|は？|は|[\s、。,.\-　の]+')
+
+# 主要な複合語（1回の走査でまとめて検出）
+_COMPOUND_RE = re.compile(
+    r'時間外労働|時間外勤務|有給休暇|育児休業|育休|産休|時短勤務|給与支払|パート'
+)
+
+# クエリから除去する記号
+_QUERY_PUNCT = str.maketrans('', '', '？?！!')
+
+
 def get_synonyms(word: str) -> List[str]:
     """
     単語の類義語を取得
@@ -174,25 +226,7 @@ def get_synonyms(word: str) -> List[str]:
     Returns:
         類義語のリスト（元の語を含む）
     """
-    # 類義語辞書（簡易版）
-    synonym_map = {
-        '時間外労働': ['時間外勤務', '残業', 'オーバータイム'],
-        '時間外勤務': ['時間外労働', '残業', 'オーバータイム'],
-        '残業': ['時間外労働', '時間外勤務', 'オーバータイム'],
-        '給与': ['給料', '賃金', '報酬', 'サラリー'],
-        '給料': ['給与', '賃金', '報酬', 'サラリー'],
-        '休暇': ['休み', '休日', 'ホリデー'],
-        '育児': ['子育て', 'チャイルドケア'],
-        '勤務': ['労働', '仕事', 'ワーク'],
-        '労働': ['勤務', '仕事', 'ワーク'],
-    }
-    
-    # 元の単語を含めた類義語リストを返す
-    synonyms = [word]
-    if word in synonym_map:
-        synonyms.extend(synonym_map[word])
-    
-    return list(set(synonyms))  # 重複を除去
+    return list(set(_ALL_SYNONYMS.get(word, (word,))))  # 重複を除去
 
 
 def extract_keywords(query: str) -> List[str]:
@@ -208,67 +242,23 @@ def extract_keywords(query: str) -> List[str]:
     # 簡易的なキーワード抽出
     # 本番環境では形態素解析を使用することを推奨
     
-    # ストップワード（除外する単語）
-    stopwords = {
-        'の', 'は', 'が', 'を', 'に', 'で', 'と', 'から', 'まで',
-        'について', 'に関して', 'とは', 'って', 'です', 'ます', '教えて',
-        '？', '?', '条件', 'ください', '教えてください', '知りたい',
-        '教える', 'おしえて', '教えて下さい'
-    }
-    
     # クエリをクリーンアップ
-    query_clean = query.replace('？', '').replace('?', '').replace('！', '').replace('!', '')
-    
-    # まず助詞などで分割してみる
-    base_words = []
-    
-    # 「について」「の」などで分割
-    parts = re.split(r'について|に関して|とは|は？|は', query_clean)
-    
-    for part in parts:
-        part = part.strip()
-        if part and part not in stopwords:
-            # さらに細かく分割
-            sub_words = re.split(r'[\s、。,.\-　の]+', part)
-            for word in sub_words:
-                word = word.strip()
-                if word and word not in stopwords and len(word) > 1:
-                    base_words.append(word)
-    
-    # 主要な複合語も抽出
-    compound_patterns = [
-        r'時間外労働',
-        r'時間外勤務',
-        r'有給休暇',
-        r'育児休業',
-        r'育休',
-        r'産休',
-        r'時短勤務',
-        r'給与支払',
-        r'パート'
-    ]
+    query_clean = query.translate(_QUERY_PUNCT)
     
-    for pattern in compound_patterns:
-        if re.search(pattern, query):
-            match = re.search(pattern, query)
-            if match:
-                base_words.append(match.group(0))
+    # 助詞・区切り文字で一度に分割し、主要な複合語も抽出
+    base_words = _PARTICLE_SPLIT.split(query_clean)
+    base_words.extend(_COMPOUND_RE.findall(query))
     
-    # ストップワードを除外（複合語は除く）
-    base_keywords = []
+    # ストップワードを除外し、類義語を追加
+    all_keywords = set()
     for w in base_words:
-        if w and w not in stopwords and len(w) > 1:
+        w = w.strip()
+        if w and w not in _STOPWORDS and len(w) > 1:
             # 「教えてください」のような長い語は無視
             if not any(stop in w for stop in ['教えて', 'ください', '知りたい']):
-                base_keywords.append(w)
+                all_keywords.update(_ALL_SYNONYMS.get(w, (w,)))
     
-    # 類義語を追加
-    all_keywords = []
-    for keyword in base_keywords:
-        synonyms = get_synonyms(keyword)
-        all_keywords.extend(synonyms)
-    
-    return list(set(all_keywords))  # 重複を除去
+    return list(all_keywords)  # 重複を除去
 
 
 def search(
@@ -299,15 +289,6 @@ def search(
         logger.warning("Empty query provided")
         return []
     
-    # Pathオブジェクトに変換
-    if isinstance(index_path, str):
-        index_path = Path(index_path)
-    
-    # データベースが存在しない場合
-    if not index_path.exists():
-        logger.error(f"Index database not found: {index_path}")
-        return []
-    
     logger.info(f"Searching for: {query[:50]}...")
     
     # 文脈を考慮したクエリの拡張
@@ -328,51 +309,93 @@ def search(
     logger.debug(f"Extracted keywords: {keywords}")
     
     # 全ページを取得
+    pages = _load_pages(index_path)
+    if not pages:
+        return []
+    
+    # 各ページに対してスコアを計算
+    scored = _score_pages(pages, [(query, keywords)], min_score)[0]
+    
+    # デバッグ情報
+    if scored:
+        logger.info(f"Found {len(scored)} results, top score: {max(s for s, _ in scored):.1f}")
+    else:
+        logger.info("No results found")
+    
+    # 上位k件を返す（全件ソートせずヒープで選択）
+    top = heapq.nlargest(top_k, scored, key=lambda x: x[0])
+    return [_make_hit(pages[idx], score) for score, idx in top]
+
+
+def _load_pages(index_path: Path | str) -> List[Tuple]:
+    """
+    検索対象の全ページを取得（エラー時は空リスト）
+    """
+    # 接続はプロセス内でキャッシュされるため、存在確認も初回のみ
     try:
         pages = get_all_pages(index_path)
+    except FileNotFoundError as e:
+        logger.error(str(e))
+        return []
     except Exception as e:
         logger.error(f"Failed to fetch pages: {e}")
         return []
     
     if not pages:
         logger.warning("No pages in index")
-        return []
     
-    # 各ページに対してスコアを計算
-    hits: List[SearchHit] = []
-    
-    for file_name, page_no, text, section, file_path in pages:
-        # スコア計算
-        score = calculate_score(
-            query=query,
-            text=text,
-            section=section,
-            boost_keywords=keywords
-        )
-        
-        # 閾値以上のスコアのみ保持
-        if score >= min_score:
-            hit = SearchHit(
-                file_name=file_name,
-                page_no=page_no,
-                score=score,
-                text=text,
-                section=section,
-                file_path=file_path
-            )
-            hits.append(hit)
-    
-    # スコアでソート（降順）
-    hits.sort(key=lambda x: x.score, reverse=True)
+    return pages
+
+
+def _score_pages(
+    pages: List[Tuple],
+    queries: List[Tuple[str, List[str]]],
+    min_score: float
+) -> List[List[Tuple[float, int]]]:
+    """
+    全ページを1回だけ走査し、複数クエリのスコアをまとめて計算
     
-    # デバッグ情報
-    if hits:
-        logger.info(f"Found {len(hits)} results, top score: {hits[0].score:.1f}")
-    else:
-        logger.info("No results found")
+    Args:
+        pages: get_all_pagesの結果
+        queries: (クエリ, ブーストキーワード) のリスト
+        min_score: 最小スコア閾値
+    
+    Returns:
+        クエリごとの (スコア, ページ番号) のリスト（閾値以上のみ）
+    
+    ページテキストの正規化はページごとに1回、
+    クエリ・キーワードの正規化はクエリごとに1回で済む。
+    """
+    prepared = [
+        (normalize_text(q), [normalize_text(k) for k in keywords] or None)
+        for q, keywords in queries
+    ]
+    results: List[List[Tuple[float, int]]] = [[] for _ in prepared]
     
-    # 上位k件を返す
-    return hits[:top_k]
+    for idx, (_, _, text, section, _) in enumerate(pages):
+        text_norm = normalize_text(text)
+        section_norm = normalize_text(section) if section else None
+        
+        for (query_norm, keyword_norms), scored in zip(prepared, results):
+            score = _score_normalized(query_norm, text_norm, section_norm, keyword_norms)
+            # 閾値以上のスコアのみ保持
+            if score >= min_score:
+                scored.append((score, idx))
+    
+    return results
+
+
+def _make_hit(page: Tuple, score: float) -> SearchHit:
+    """get_all_pagesの行からSearchHitを作成"""
+    file_name, page_no, text, section, file_path = page
+    return SearchHit(
+        file_name=file_name,
+        page_no=page_no,
+        score=score,
+        text=text,
+        section=section,
+        file_path=file_path
+    )
 
 
 def search_with_context(
@@ -394,29 +417,35 @@ def search_with_context(
     Returns:
         検索結果のリスト
     """
-    # メイン検索
-    main_hits = search(query, top_k * 2, index_path)
+    if not context_queries:
+        return search(query, top_k, index_path)
     
-    if not context_queries or not main_hits:
-        return main_hits[:top_k]
+    pages = _load_pages(index_path)
+    if not pages:
+        return []
     
-    # コンテキストクエリでも検索
+    # メインクエリとコンテキストクエリを1回の走査でまとめて採点
+    queries = [query] + list(context_queries)
+    scored = _score_pages(
+        pages,
+        [(q, extract_keywords(q)) for q in queries],
+        min_score=30.0
+    )
+    
+    main_scored = heapq.nlargest(top_k * 2, scored[0], key=lambda x: x[0])
+    if not main_scored:
+        return []
+    
+    # コンテキストクエリの上位ヒットに重みを付けて加算
     context_scores = {}
-    for context_query in context_queries:
-        context_hits = search(context_query, top_k, index_path)
-        for hit in context_hits:
-            key = (hit.file_name, hit.page_no)
-            if key not in context_scores:
-                context_scores[key] = 0
-            context_scores[key] += hit.score * 0.3  # コンテキストの重み
+    for context_scored in scored[1:]:
+        for score, idx in heapq.nlargest(top_k, context_scored, key=lambda x: x[0]):
+            context_scores[idx] = context_scores.get(idx, 0) + score * 0.3  # コンテキストの重み
     
     # メインヒットのスコアを調整
-    for hit in main_hits:
-        key = (hit.file_name, hit.page_no)
-        if key in context_scores:
-            hit.score += context_scores[key]
-    
-    # 再ソート
-    main_hits.sort(key=lambda x: x.score, reverse=True)
+    main_hits = [
+        _make_hit(pages[idx], score + context_scores.get(idx, 0))
+        for score, idx in main_scored
+    ]
     
-    return main_hits[:top_k]
\ No newline at end of file
+    return heapq.nlargest(top_k, main_hits, key=lambda x: x.score)
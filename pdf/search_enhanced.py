@@ -2,13 +2,19 @@
 強化された検索モジュール
 略語・同義語対応とクエリ拡張による精度向上
 """
-from dataclasses import dataclass
-from typing import List, Optional, Set, Dict
-import sqlite3
+import heapq
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import Collection, List, Optional, FrozenSet, Dict, Sequence, Tuple
 from pathlib import Path
-from rapidfuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
 import re
 from loguru import logger
+from .index import candidate_batches, get_cached_connection
+from .term_matcher import TermMatcher
 
 
 @dataclass
@@ -21,6 +27,7 @@ class SearchResult:
     text: str
     section: Optional[str]
     matched_terms: List[str]  # マッチした用語
+    text_lower: Optional[str] = field(default=None, repr=False)  # 小文字化済みのテキスト
 
 
 # 同義語・略語辞書
@@ -40,8 +47,27 @@ for short, longs in SYNONYM_DICT.items():
     for long_term in longs:
         REVERSE_SYNONYM[long_term] = short
 
+# 辞書の見出し語 → 置換候補（略語→正式名称、正式名称→略語）
+_SYNONYM_MAP: Dict[str, Tuple[str, ...]] = {
+    **{short: tuple(longs) for short, longs in SYNONYM_DICT.items()},
+    **{long_term: (short,) for long_term, short in REVERSE_SYNONYM.items()},
+}
+
+# 見出し語をクエリ1回の走査で検出するマッチャー（「有給」と「有給休暇」のような重なりも検出）
+_SYNONYM_MATCHER = TermMatcher(_SYNONYM_MAP)
+
+# 拡張クエリからキーワード（漢字・英字の連続）を抽出するパターン
+_KEYWORD_RE = re.compile(r'[\u4e00-\u9fff]+|[a-zA-Z]+')
 
-def expand_query(query: str) -> Set[str]:
+# 検索結果キャッシュ（(query, top_k, min_score, インデックスの絶対パス, 更新時刻) → 結果）
+# 複数のスレッドから検索されるため、参照・更新はロックを取って行う
+_RESULT_CACHE_SIZE = 128
+_result_cache: "OrderedDict[Tuple, List[SearchResult]]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1024)
+def expand_query(query: str) -> FrozenSet[str]:
     """
     クエリを拡張（略語→正式名称、正式名称→略語）
     
@@ -49,63 +75,118 @@ def expand_query(query: str) -> Set[str]:
         query: 検索クエリ
         
     Returns:
-        拡張されたクエリセット
+        拡張されたクエリセット（キャッシュ共有のため変更不可）
     """
     expanded = {query}
     query_lower = query.lower()
     
-    # 略語を正式名称に展開
-    for short, longs in SYNONYM_DICT.items():
-        if short in query_lower:
-            for long_term in longs:
-                expanded.add(query_lower.replace(short, long_term))
+    # 略語を正式名称に、正式名称を略語に変換
+    for term in _SYNONYM_MATCHER.found(query_lower):
+        for replacement in _SYNONYM_MAP[term]:
+            expanded.add(query_lower.replace(term, replacement))
     
-    # 正式名称を略語に変換
-    for long_term, short in REVERSE_SYNONYM.items():
-        if long_term in query_lower:
-            expanded.add(query_lower.replace(long_term, short))
+    return frozenset(expanded)
+
+
+def keywords_by_expansion(expanded_queries: Collection[str]) -> Dict[str, List[str]]:
+    """
+    拡張クエリごとのマッチング用キーワード（2文字以上）を抽出
     
-    return expanded
+    Args:
+        expanded_queries: expand_queryの結果
+        
+    Returns:
+        拡張クエリ → キーワードリストの辞書
+    """
+    return {
+        exp_query: [kw for kw in _KEYWORD_RE.findall(exp_query) if len(kw) >= 2]
+        for exp_query in expanded_queries
+    }
+
+
+def build_term_matcher(
+    expanded_queries: Collection[str],
+    keywords_per_exp: Dict[str, List[str]]
+) -> TermMatcher:
+    """
+    拡張クエリとキーワードをまとめて検出するマッチャーを作成
+    
+    クエリごとに1回作成し、全ページのスコア計算で使い回す
+    """
+    terms = list(expanded_queries)
+    for keywords in keywords_per_exp.values():
+        terms.extend(keywords)
+    return TermMatcher(terms)
 
 
 def calculate_smart_score(
     query: str,
     text: str,
     file_name: str,
-    section: Optional[str]
+    section: Optional[str],
+    expanded_queries: Optional[Collection[str]] = None,
+    keywords_per_exp: Optional[Dict[str, List[str]]] = None,
+    base_scores: Optional[Sequence[float]] = None,
+    term_matcher: Optional[TermMatcher] = None,
+    text_lower: Optional[str] = None,
+    section_lower: Optional[str] = None
 ) -> tuple[float, List[str]]:
     """
     スマートスコア計算（同義語対応）
     
+    Args:
+        expanded_queries: 拡張済みクエリ（行ごとの再計算を避けるため呼び出し側で渡す）
+        keywords_per_exp: keywords_by_expansionの結果（同上）
+        base_scores: expanded_queriesと同じ順の部分一致スコア（一括計算済みの場合）
+        term_matcher: build_term_matcherの結果（同上）
+        text_lower: 小文字化済みのテキスト（インデックスのtext_lower列）
+        section_lower: 小文字化済みのセクション名（インデックスのsection_lower列）
+    
     Returns:
         (スコア, マッチした用語のリスト)
     """
-    text_lower = text.lower()
+    if text_lower is None:
+        text_lower = text.lower()
+    if section_lower is None and section:
+        section_lower = section.lower()
     query_lower = query.lower()
     
     # クエリ拡張
-    expanded_queries = expand_query(query)
+    if expanded_queries is None:
+        expanded_queries = expand_query(query)
+    if keywords_per_exp is None:
+        keywords_per_exp = keywords_by_expansion(expanded_queries)
+    if term_matcher is None:
+        term_matcher = build_term_matcher(expanded_queries, keywords_per_exp)
+    
+    # 拡張クエリ・キーワードの出現をテキスト1回の走査でまとめて検出
+    found_terms = term_matcher.found(text_lower)
     
     # 最高スコアを計算
     max_score = 0
-    matched_terms = []
+    # 重複排除をO(1)で行いつつ、最初に一致した順を保つ（抜粋位置の決定に使うため）
+    matched: Dict[str, None] = {}
     
-    for exp_query in expanded_queries:
+    for i, exp_query in enumerate(expanded_queries):
         # 部分一致スコア
-        score = fuzz.partial_ratio(exp_query, text_lower)
+        if base_scores is not None:
+            score = base_scores[i]
+        elif exp_query in found_terms:
+            # 完全に含まれる場合は部分一致スコアが定義上100のためDPを省略
+            score = 100.0
+        else:
+            score = fuzz.partial_ratio(exp_query, text_lower)
         
         # 完全一致ボーナス
-        if exp_query in text_lower:
+        if exp_query in found_terms:
             score += 30
-            matched_terms.append(exp_query)
+            matched[exp_query] = None
         
         # キーワードごとのマッチング
-        keywords = re.findall(r'[\u4e00-\u9fff]+|[a-zA-Z]+', exp_query)
-        for keyword in keywords:
-            if len(keyword) >= 2 and keyword in text_lower:
+        for keyword in keywords_per_exp[exp_query]:
+            if keyword in found_terms:
                 score += 10
-                if keyword not in matched_terms:
-                    matched_terms.append(keyword)
+                matched[keyword] = None
         
         max_score = max(max_score, score)
     
@@ -124,11 +205,104 @@ def calculate_smart_score(
     # セクションマッチボーナス
     if section:
         for exp_query in expanded_queries:
-            if exp_query in section.lower():
+            if exp_query in section_lower:
                 max_score += 25
                 break
     
-    return max_score, matched_terms
+    return max_score, list(matched)
+
+
+def partial_ratio_matrix(
+    expanded_queries: Sequence[str],
+    texts_lower: Sequence[str]
+) -> np.ndarray:
+    """
+    部分一致スコアを (拡張クエリ数 × ページ数) の行列として一括計算
+    
+    拡張クエリがそのまま含まれるページは定義上100のため、
+    含まれないページだけをC++側（cdist）でまとめて計算する
+    
+    Args:
+        expanded_queries: 拡張済みクエリ
+        texts_lower: 小文字化済みのページテキスト
+        
+    Returns:
+        fuzz.partial_ratioと同じ値の行列
+    """
+    matrix = np.full((len(expanded_queries), len(texts_lower)), 100.0)
+    for i, exp_query in enumerate(expanded_queries):
+        misses = [j for j, text in enumerate(texts_lower) if exp_query not in text]
+        if misses:
+            matrix[i, misses] = process.cdist(
+                [exp_query],
+                [texts_lower[j] for j in misses],
+                scorer=fuzz.partial_ratio,
+                dtype=np.float64,
+                workers=-1
+            )[0]
+    return matrix
+
+
+@dataclass
+class SmartScorer:
+    """
+    calculate_smart_scoreによるページ行の一括スコア計算
+    
+    クエリにのみ依存する値（拡張クエリ、キーワード、マッチャー）を
+    作成時に1回だけ計算し、全バッチで使い回す
+    """
+    query: str
+    min_score: float = 30
+    expanded_queries: Tuple[str, ...] = field(init=False)
+    keywords_per_exp: Dict[str, List[str]] = field(init=False)
+    term_matcher: TermMatcher = field(init=False)
+    
+    def __post_init__(self):
+        self.expanded_queries = tuple(expand_query(self.query))
+        self.keywords_per_exp = keywords_by_expansion(self.expanded_queries)
+        self.term_matcher = build_term_matcher(self.expanded_queries, self.keywords_per_exp)
+    
+    @property
+    def candidate_queries(self) -> Tuple[str, ...]:
+        """FTS5で候補を絞り込むためのクエリ"""
+        return self.expanded_queries
+    
+    def score_rows(self, rows: Sequence[Tuple]) -> List[SearchResult]:
+        """
+        ページ行をスコア計算し、min_score以上のものを返す
+        
+        Args:
+            rows: index.SCORING_COLUMNSの順のタプル
+            
+        Returns:
+            検索結果のリスト（行の順）
+        """
+        if not rows:
+            return []
+        
+        base_matrix = partial_ratio_matrix(self.expanded_queries, [row[5] for row in rows])
+        
+        results = []
+        for row, base_scores in zip(rows, base_matrix.T.tolist()):
+            file_name, file_path, page_no, text, section, text_lower, section_lower = row
+            score, matched_terms = calculate_smart_score(
+                self.query, text, file_name, section,
+                self.expanded_queries, self.keywords_per_exp, base_scores,
+                self.term_matcher, text_lower, section_lower
+            )
+            
+            if score >= self.min_score:
+                results.append(SearchResult(
+                    file_name=file_name,
+                    file_path=file_path,
+                    page_no=page_no,
+                    score=score,
+                    text=text,
+                    section=section,
+                    matched_terms=matched_terms,
+                    text_lower=text_lower
+                ))
+        return results
 
 
 def search_enhanced(
@@ -152,40 +326,48 @@ def search_enhanced(
     if not query or not index_path.exists():
         return []
     
+    # 同一クエリの再検索はキャッシュから返す（インデックス更新で無効化）
+    # 別のインデックスの結果を返さないよう、解決済みのパスもキーに含める
+    index_path = index_path.resolve()
+    cache_key = (query, top_k, min_score, str(index_path), index_path.stat().st_mtime_ns)
+    with _result_cache_lock:
+        cached = _result_cache.get(cache_key)
+        if cached is not None:
+            _result_cache.move_to_end(cache_key)
+            return _copy_results(cached)
+    
+    scorer = SmartScorer(query, min_score)
     results = []
     
-    with sqlite3.connect(index_path) as db:
-        cursor = db.execute(
-            "SELECT file_name, file_path, page_no, text, section FROM pages"
+    # 検索用の読み取り専用接続をプロセス内で使い回す
+    db = get_cached_connection(index_path)
+    
+    # FTS5で絞り込んだ候補（使えない場合は全件）をバッチ単位でスコア計算し、
+    # スコア上位top_k件だけを保持する（同点は先に出現したものを優先）
+    for batch in candidate_batches(db, scorer.candidate_queries):
+        results = heapq.nlargest(
+            top_k, results + scorer.score_rows(batch), key=lambda x: x.score
         )
-        
-        for file_name, file_path, page_no, text, section in cursor:
-            score, matched_terms = calculate_smart_score(
-                query, text, file_name, section
-            )
-            
-            if score >= min_score:
-                results.append(SearchResult(
-                    file_name=file_name,
-                    file_path=file_path,
-                    page_no=page_no,
-                    score=score,
-                    text=text,
-                    section=section,
-                    matched_terms=matched_terms
-                ))
     
-    # スコアでソート
-    results.sort(key=lambda x: x.score, reverse=True)
+    with _result_cache_lock:
+        _result_cache[cache_key] = results
+        if len(_result_cache) > _RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
     
-    return results[:top_k]
+    return _copy_results(results)
+
+
+def _copy_results(results: List[SearchResult]) -> List[SearchResult]:
+    """キャッシュ内の結果が呼び出し側の変更の影響を受けないよう複製を返す"""
+    return [replace(r, matched_terms=list(r.matched_terms)) for r in results]
 
 
 def extract_smart_snippet(
     text: str,
     query: str,
     matched_terms: List[str],
-    window: int = 150
+    window: int = 150,
+    text_lower: Optional[str] = None
 ) -> str:
     """
     スマート抜粋生成（マッチした用語をハイライト）
@@ -195,11 +377,22 @@ def extract_smart_snippet(
         query: 検索クエリ
         matched_terms: マッチした用語リスト
         window: 前後の文字数
+        text_lower: 小文字化済みのテキスト（SearchResult.text_lower。省略時はここで計算）
         
     Returns:
         抜粋テキスト
     """
-    text_lower = text.lower()
+    if text_lower is None:
+        text_lower = text.lower()
+    
+    # 同じ語を二度探さないよう検索位置を記録
+    pos_cache: Dict[str, int] = {}
+    
+    def find(term: str) -> int:
+        term_lower = term.lower()
+        if term_lower not in pos_cache:
+            pos_cache[term_lower] = text_lower.find(term_lower)
+        return pos_cache[term_lower]
     
     # マッチした用語の位置を探す
     best_pos = -1
@@ -207,7 +400,7 @@ def extract_smart_snippet(
     
     # まず拡張クエリでの位置を探す
     for term in matched_terms:
-        pos = text_lower.find(term.lower())
+        pos = find(term)
         if pos != -1:
             best_pos = pos
             best_term = term
@@ -215,7 +408,7 @@ def extract_smart_snippet(
     
     # 見つからない場合は元のクエリで
     if best_pos == -1:
-        best_pos = text_lower.find(query.lower())
+        best_pos = find(query)
         best_term = query
     
     # それでも見つからない場合は先頭から
@@ -234,15 +427,25 @@ def extract_smart_snippet(
     if end < len(text):
         excerpt = excerpt + "..."
     
-    # すべてのマッチ用語をハイライト
-    for term in matched_terms:
-        # 大文字小文字を無視してマッチング
-        pattern = re.compile(re.escape(term), re.IGNORECASE)
-        excerpt = pattern.sub(f"**{term}**", excerpt)
+    # すべてのマッチ用語を1回の置換でハイライト
+    if matched_terms:
+        pattern = _highlight_pattern(tuple(sorted(set(matched_terms))))
+        excerpt = pattern.sub(lambda m: f"**{m.group(0)}**", excerpt)
     
     return excerpt
 
 
+@lru_cache(maxsize=256)
+def _highlight_pattern(terms: Tuple[str, ...]) -> "re.Pattern[str]":
+    """
+    ハイライト用の選択パターンを作成（大文字小文字を無視）
+    
+    長い語を先に並べ、短い語が長い語の一部だけを囲むのを防ぐ
+    """
+    ordered = sorted(terms, key=len, reverse=True)
+    return re.compile("|".join(re.escape(t) for t in ordered), re.IGNORECASE)
+
+
 # 旧API互換性のため
 def generate_answer_from_hits(query: str, hits: List[SearchResult]) -> Dict:
     """
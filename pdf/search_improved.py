@@ -2,16 +2,25 @@
 改善された検索モジュール
 質問の文脈に応じて適切なPDFから回答を取得
 """
-from dataclasses import dataclass
-from typing import List, Optional, Tuple, Dict
+import bisect
+import heapq
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple, Dict
 import sqlite3
 from pathlib import Path
 from rapidfuzz import fuzz
 import re
 from loguru import logger
+from .index import (
+    SCORING_COLUMNS, column_sql, fts_candidates, get_cached_connection,
+    register_connection_function
+)
+from .term_matcher import TermMatcher
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchHit:
     file_name: str
     file_path: str
@@ -31,6 +40,24 @@ FILE_TOPICS = {
 # 一般的な就業規則のトピック
 GENERAL_TOPICS = ["有給", "有休", "年休", "給与", "給料", "賃金", "勤務時間", "残業", "遅刻", "早退", "欠勤", "退職", "解雇", "懲戒"]
 
+# 検索結果に含める最低スコア（このスコアを超えるもののみ）
+MIN_RELEVANCE_SCORE = 30
+
+# キーワード抽出で除外する語
+_STOPWORDS = frozenset(["について", "教えて", "ください", "とは", "何", "どう", "いつ", "どこ"])
+
+# キーワード抽出時の区切り文字
+_SPLIT_RE = re.compile(r'[、。\s？！]')
+
+# 文の区切り
+_SENTENCE_SPLIT_RE = re.compile(r'[。\n]')
+
+# セクション名の条文番号（算用数字・漢数字）
+_SECTION_ARTICLE_RE = re.compile(r'第[\d一二三四五六七八九十]+条')
+
+# 本文中の条文番号（漢数字・全角数字）
+_ARTICLE_RE = re.compile(r'第[一二三四五六七八九十０-９ー−]+条')
+
 
 def identify_query_topic(query: str) -> str:
     """質問のトピックを特定"""
@@ -52,22 +79,50 @@ def identify_query_topic(query: str) -> str:
     return "unknown"
 
 
-def calculate_relevance_score(query: str, text: str, file_name: str, section: Optional[str]) -> float:
+def calculate_relevance_score(
+    query: str,
+    text: str,
+    file_name: str,
+    section: Optional[str],
+    keywords: Optional[List[str]] = None,
+    query_topic: Optional[str] = None,
+    text_lower: Optional[str] = None,
+    section_lower: Optional[str] = None,
+    term_matcher: Optional[TermMatcher] = None
+) -> float:
     """
     文脈を考慮した関連性スコアを計算
+    
+    keywords・query_topic・term_matcherはクエリのみに依存するため、
+    行ごとの再計算を避けたい場合は呼び出し側で計算して渡す。
+    text_lower・section_lowerにはインデックスの小文字化済みの列を渡せる
     """
     query_lower = query.lower()
-    text_lower = text.lower()
+    if text_lower is None:
+        text_lower = text.lower()
+    if section_lower is None and section:
+        section_lower = section.lower()
+    if keywords is None:
+        keywords = extract_keywords(query)
+    if term_matcher is None:
+        term_matcher = build_relevance_matcher(query, keywords)
     
-    # 基本スコア（部分一致）
-    base_score = fuzz.partial_ratio(query_lower, text_lower)
+    # クエリ・キーワード・単語の出現回数をテキスト1回の走査でまとめて数える
+    counts = term_matcher.counts(text_lower)
+    
+    # 基本スコア（部分一致）。完全に含まれる場合は定義上100のためDPを省略
+    if query_lower in counts:
+        base_score = 100.0
+    else:
+        base_score = fuzz.partial_ratio(query_lower, text_lower)
     
     # デバッグ用ログ
     logger.debug(f"File: {file_name}, Base score: {base_score}")
     
     # トピック一致ボーナス
     topic_bonus = 0
-    query_topic = identify_query_topic(query)
+    if query_topic is None:
+        query_topic = identify_query_topic(query)
     
     if query_topic == "育児介護":
         if "育児介護" in file_name:
@@ -88,16 +143,15 @@ def calculate_relevance_score(query: str, text: str, file_name: str, section: Op
     # セクションボーナス
     section_bonus = 0
     if section:
-        if re.search(r'第[\d一二三四五六七八九十]+条', section):
+        if _SECTION_ARTICLE_RE.search(section):
             section_bonus = 10
-        if query_lower in section.lower():
+        if query_lower in section_lower:
             section_bonus += 15
     
     # キーワード密度ボーナス
     keyword_bonus = 0
-    keywords = extract_keywords(query)
     for keyword in keywords:
-        count = text_lower.count(keyword.lower())
+        count = counts.get(keyword.lower(), 0)
         if count > 0:
             keyword_bonus += min(count * 2, 10)
     
@@ -105,7 +159,7 @@ def calculate_relevance_score(query: str, text: str, file_name: str, section: Op
     direct_match_bonus = 0
     query_words = query.split()
     for word in query_words:
-        if len(word) >= 2 and word.lower() in text_lower:
+        if len(word) >= 2 and word.lower() in counts:
             direct_match_bonus += 15
     
     total_score = base_score + topic_bonus + section_bonus + keyword_bonus + direct_match_bonus
@@ -115,20 +169,149 @@ def calculate_relevance_score(query: str, text: str, file_name: str, section: Op
     return max(0, total_score)
 
 
+def build_relevance_matcher(query: str, keywords: List[str]) -> TermMatcher:
+    """
+    クエリ全体・キーワード・クエリの単語をまとめて数えるマッチャーを作成
+    
+    クエリごとに1回作成し、全ページのスコア計算で使い回す
+    """
+    terms = [query.lower()]
+    terms.extend(keyword.lower() for keyword in keywords)
+    terms.extend(word.lower() for word in query.split() if len(word) >= 2)
+    return TermMatcher(terms)
+
+
 def extract_keywords(query: str) -> List[str]:
     """重要キーワードを抽出"""
-    # 不要な語を除去
-    stopwords = ["について", "教えて", "ください", "とは", "何", "どう", "いつ", "どこ"]
-    
     keywords = []
-    for word in re.split(r'[、。\s？！]', query):
+    for word in _SPLIT_RE.split(query):
         word = word.strip()
-        if word and word not in stopwords and len(word) > 1:
+        if word and word not in _STOPWORDS and len(word) > 1:
             keywords.append(word)
     
     return keywords
 
 
+@dataclass
+class RelevanceScorer:
+    """
+    calculate_relevance_scoreによるページ行の一括スコア計算
+    
+    クエリにのみ依存する値（キーワード、トピック、マッチャー）を
+    作成時に1回だけ計算し、全バッチで使い回す
+    """
+    query: str
+    keywords: List[str] = field(init=False)
+    query_topic: str = field(init=False)
+    term_matcher: TermMatcher = field(init=False)
+    
+    def __post_init__(self):
+        self.keywords = extract_keywords(self.query)
+        self.query_topic = identify_query_topic(self.query)
+        self.term_matcher = build_relevance_matcher(self.query, self.keywords)
+    
+    @property
+    def candidate_queries(self) -> List[str]:
+        """FTS5で候補を絞り込むためのクエリ"""
+        return [self.query] + self.keywords
+    
+    def score_rows(self, rows: Sequence[Tuple]) -> List[SearchHit]:
+        """
+        ページ行をスコア計算し、しきい値を超えるものを返す
+        
+        Args:
+            rows: index.SCORING_COLUMNSの順のタプル
+            
+        Returns:
+            検索結果のリスト（行の順）
+        """
+        hits = []
+        for file_name, file_path, page_no, text, section, text_lower, section_lower in rows:
+            # 関連性スコアを計算
+            score = calculate_relevance_score(
+                self.query, text, file_name, section, self.keywords, self.query_topic,
+                text_lower, section_lower, self.term_matcher
+            )
+            
+            if score > MIN_RELEVANCE_SCORE:  # 最低スコアのしきい値
+                hits.append(SearchHit(
+                    file_name=file_name,
+                    file_path=file_path,
+                    page_no=page_no,
+                    score=score,
+                    text=text,
+                    section=section
+                ))
+        return hits
+    
+    def top_hits_in_db(self, db: sqlite3.Connection, top_k: int) -> List[SearchHit]:
+        """
+        全ページをSQLite内でスコア計算し、上位top_k件のみ取得
+        
+        Args:
+            db: データベース接続
+            top_k: 返す結果の最大数
+            
+        Returns:
+            しきい値を超える検索結果のリスト（スコア順、同点はページの登録順）
+        
+        スコア関数（接続を開くときに登録済みのUDF）で並べ替えと件数の制限もSQLiteで行う。
+        上位以外の行はタプルやSearchHitとしてPythonに渡されない。
+        """
+        text_lower = column_sql(db, "text_lower")
+        section_lower = column_sql(db, "section_lower")
+        cursor = db.execute(f"""
+            SELECT file_name, file_path, page_no, text, section,
+                   relevance_score(?, {text_lower}, file_name, section, {section_lower}) AS score
+            FROM pages
+            ORDER BY score DESC, id
+            LIMIT ?
+        """, (self.query, top_k))
+        
+        # しきい値以下の行は上位にしか現れないため、受け取った分だけ判定すれば足りる
+        return [
+            SearchHit(
+                file_name=file_name,
+                file_path=file_path,
+                page_no=page_no,
+                score=score,
+                text=text,
+                section=section
+            )
+            for file_name, file_path, page_no, text, section, score in cursor
+            if score > MIN_RELEVANCE_SCORE
+        ]
+
+
+@lru_cache(maxsize=32)
+def _cached_scorer(query: str) -> RelevanceScorer:
+    """クエリごとのRelevanceScorer（同じクエリの再検索とUDFで使い回す）"""
+    return RelevanceScorer(query)
+
+
+def _relevance_score_udf(
+    query: str,
+    text_lower: str,
+    file_name: str,
+    section: Optional[str],
+    section_lower: Optional[str]
+) -> float:
+    """
+    SQLiteに登録するスコア関数
+    
+    接続ごとに1回だけ登録するため、クエリ固有の状態は持たず
+    引数のqueryから_cached_scorerを引く
+    """
+    scorer = _cached_scorer(query)
+    return calculate_relevance_score(
+        query, text_lower, file_name, section, scorer.keywords, scorer.query_topic,
+        text_lower, section_lower, scorer.term_matcher
+    )
+
+
+register_connection_function("relevance_score", 5, _relevance_score_udf)
+
+
 def search_improved(
     query: str,
     index_path: Path = Path("./data/index.sqlite"),
@@ -152,31 +335,46 @@ def search_improved(
         logger.error(f"Index not found: {index_path}")
         return []
     
-    hits = []
+    scorer = _cached_scorer(query)
     
-    with sqlite3.connect(index_path) as db:
-        cursor = db.execute(
-            "SELECT file_name, file_path, page_no, text, section FROM pages"
-        )
-        for file_name, file_path, page_no, text, section in cursor:
-            # 関連性スコアを計算
-            score = calculate_relevance_score(query, text, file_name, section)
-            
-            if score > 30:  # 最低スコアのしきい値
-                hits.append(SearchHit(
-                    file_name=file_name,
-                    file_path=file_path,
-                    page_no=page_no,
-                    score=score,
-                    text=text,
-                    section=section
-                ))
+    # 検索用の読み取り専用接続をプロセス内で使い回す
+    db = get_cached_connection(index_path)
     
-    # スコアでソート
-    hits.sort(key=lambda x: x.score, reverse=True)
+    # FTS5で絞り込んだ候補のみをスコア計算し、上位top_k件を返す（同点は候補順）
+    rows = fts_candidates(db, scorer.candidate_queries, columns=SCORING_COLUMNS)
+    if rows is not None:
+        return heapq.nlargest(top_k, scorer.score_rows(rows), key=lambda x: x.score)
     
-    # 上位結果のみ返す
-    return hits[:top_k]
+    # 使えない場合は全件をSQLite内でスコア計算し、上位のみ受け取る
+    return scorer.top_hits_in_db(db, top_k)
+
+
+def count_keywords_per_sentence(text: str, keywords: List[str]) -> List[int]:
+    """
+    文ごとに含まれるキーワードの数を数える（大文字小文字を無視）
+    
+    Args:
+        text: 対象テキスト
+        keywords: キーワードリスト
+        
+    Returns:
+        _SENTENCE_SPLIT_REで分割した各文のキーワード数
+    
+    文ごと・キーワードごとに `in` を繰り返す代わりに、テキスト全体を1回走査して
+    出現位置を区切り文字の位置（bisect）で文に割り当てる。
+    キーワードは区切り文字を含まないため、出現が文をまたぐことはない。
+    """
+    text_lower = text.lower()
+    boundaries = [m.start() for m in _SENTENCE_SPLIT_RE.finditer(text_lower)]
+    counts = [0] * (len(boundaries) + 1)
+    
+    # 同じキーワードが複数回指定された場合はその回数分数える
+    weights = Counter(kw.lower() for kw in keywords)
+    for term, starts in TermMatcher(weights).find_positions(text_lower).items():
+        for index in {bisect.bisect_left(boundaries, start) for start in starts}:
+            counts[index] += weights[term]
+    
+    return counts
 
 
 def generate_answer_from_hits(query: str, hits: List[SearchHit]) -> Dict[str, any]:
@@ -203,17 +401,13 @@ def generate_answer_from_hits(query: str, hits: List[SearchHit]) -> Dict[str, an
     keywords = extract_keywords(query)
     relevant_sentences = []
     
-    sentences = re.split(r'[。\n]', best_hit.text)
+    sentences = _SENTENCE_SPLIT_RE.split(best_hit.text)
     
     # キーワードを含む文を優先的に抽出
-    for sentence in sentences:
+    keyword_counts = count_keywords_per_sentence(best_hit.text, keywords)
+    for sentence, keyword_count in zip(sentences, keyword_counts):
         sentence = sentence.strip()
-        if not sentence:
-            continue
-        
-        # キーワードが含まれるかチェック
-        keyword_count = sum(1 for kw in keywords if kw.lower() in sentence.lower())
-        if keyword_count > 0:
+        if sentence and keyword_count > 0:
             relevant_sentences.append((keyword_count, sentence))
     
     # キーワード数でソート
@@ -237,7 +431,7 @@ def generate_answer_from_hits(query: str, hits: List[SearchHit]) -> Dict[str, an
         # キーワードが見つからない場合は条文番号を含む部分を探す
         article_sentences = []
         for sentence in sentences:
-            if re.search(r'第[一二三四五六七八九十０-９ー−]+条', sentence):
+            if _ARTICLE_RE.search(sentence):
                 article_sentences.append(sentence.strip())
         
         if article_sentences:
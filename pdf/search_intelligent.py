@@ -2,13 +2,21 @@
 インテリジェント検索モジュール
 文脈理解と条文優先順位を考慮した高精度検索
 """
-from dataclasses import dataclass
-from typing import List, Optional, Set, Dict, Tuple
-import sqlite3
+from dataclasses import dataclass, field
+from functools import lru_cache
+import heapq
+from typing import Collection, FrozenSet, List, Optional, Sequence, Dict, Tuple
 from pathlib import Path
-from rapidfuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
 import re
 from loguru import logger
+from .index import (
+    FTS_RERANK_LIMIT, INTELLIGENT_COLUMNS, candidate_batches, fetch_page_texts,
+    get_cached_connection
+)
+from .term_matcher import TermMatcher, count_non_overlapping
+from .article_info import PAGE_FLAG_PERIOD, extract_article_info, page_flags
 
 
 @dataclass
@@ -22,6 +30,10 @@ class SearchResult:
     section: Optional[str]
     matched_terms: List[str]
     relevance_type: str  # 関連性のタイプ（definition/condition/procedure等）
+    # スコア計算時に求めた用語の出現位置（抜粋生成で再走査しないため）
+    term_positions: Dict[str, List[int]] = field(default_factory=dict, repr=False)
+    # pagesのid（原文を後から取得するため）
+    page_id: Optional[int] = field(default=None, repr=False)
 
 
 # 同義語・略語辞書
@@ -45,6 +57,26 @@ INTENT_PATTERNS = {
     "benefit": ["給付", "手当", "給与", "お金", "支給"],  # 給付・手当
 }
 
+# 略語・意図パターンをクエリ1回の走査で検出するマッチャー
+_SYNONYM_MATCHER = TermMatcher(SYNONYM_DICT)
+_INTENT_MATCHER = TermMatcher(
+    pattern for patterns in INTENT_PATTERNS.values() for pattern in patterns
+)
+
+# クリーンなクエリを作るときに除去する意図パターンと疑問符（長いものを優先）
+_INTENT_STRIP_RE = re.compile("|".join(
+    re.escape(pattern) for pattern in sorted(
+        [p for patterns in INTENT_PATTERNS.values() for p in patterns] + ["？", "?"],
+        key=len, reverse=True
+    )
+))
+
+# 抜粋の開始位置とする条文見出し
+_ARTICLE_HEADING_RE = re.compile(r'第[０-９0-9一二三四五六七八九十]+条')
+
+# 拡張クエリからキーワード（漢字・英字の連続）を抽出するパターン
+_KEYWORD_RE = re.compile(r'[\u4e00-\u9fff]+|[a-zA-Z]+')
+
 # 条文の重要度（若い番号ほど基本的な内容）
 ARTICLE_IMPORTANCE = {
     "目的": 100,  # 第1条（目的）
@@ -58,36 +90,50 @@ ARTICLE_IMPORTANCE = {
 }
 
 
-def expand_query(query: str) -> Set[str]:
-    """クエリを拡張（略語→正式名称）"""
+@lru_cache(maxsize=1024)
+def expand_query(query: str) -> FrozenSet[str]:
+    """クエリを拡張（略語→正式名称。キャッシュ共有のため変更不可）"""
     expanded = {query}
     query_lower = query.lower()
     
     # まず元のクエリで拡張
-    for short, longs in SYNONYM_DICT.items():
-        if short in query_lower:
-            for long_term in longs:
-                expanded.add(query_lower.replace(short, long_term))
+    for short in _SYNONYM_MATCHER.found(query_lower):
+        for long_term in SYNONYM_DICT[short]:
+            expanded.add(query_lower.replace(short, long_term))
     
     # キーワードのみでも拡張（「について教えて」などを除去）
-    # 意図パターンを除去
-    clean_query = query_lower
-    for pattern_list in INTENT_PATTERNS.values():
-        for pattern in pattern_list:
-            clean_query = clean_query.replace(pattern, "").strip()
-    clean_query = clean_query.replace("？", "").replace("?", "").strip()
+    # 意図パターンと疑問符を1回の置換で除去
+    clean_query = _INTENT_STRIP_RE.sub("", query_lower).strip()
     
     if clean_query != query_lower and clean_query:
         expanded.add(clean_query)
         # クリーンなクエリでも同義語展開
-        for short, longs in SYNONYM_DICT.items():
-            if short in clean_query:
-                for long_term in longs:
-                    expanded.add(clean_query.replace(short, long_term))
+        for short in _SYNONYM_MATCHER.found(clean_query):
+            for long_term in SYNONYM_DICT[short]:
+                expanded.add(clean_query.replace(short, long_term))
     
-    return expanded
+    return frozenset(expanded)
 
 
+@lru_cache(maxsize=1024)
+def _query_keywords(exp_query: str) -> Tuple[str, ...]:
+    """拡張クエリのキーワード（2文字以上の漢字・英字の連続）"""
+    return tuple(kw for kw in _KEYWORD_RE.findall(exp_query) if len(kw) >= 2)
+
+
+def build_term_matcher(expanded_queries: Collection[str]) -> TermMatcher:
+    """
+    拡張クエリとそのキーワード（2文字以上）をまとめて数えるマッチャーを作成
+    
+    クエリごとに1回作成し、全ページのスコア計算で使い回す
+    """
+    terms = list(expanded_queries)
+    for exp_query in expanded_queries:
+        terms.extend(_query_keywords(exp_query))
+    return TermMatcher(terms)
+
+
+@lru_cache(maxsize=1024)
 def analyze_query_intent(query: str) -> str:
     """
     クエリの意図を分析
@@ -95,10 +141,10 @@ def analyze_query_intent(query: str) -> str:
     Returns:
         意図のタイプ（definition/condition/procedure/period/benefit/general）
     """
-    query_lower = query.lower()
+    found = _INTENT_MATCHER.found(query.lower())
     
     for intent_type, keywords in INTENT_PATTERNS.items():
-        if any(keyword in query_lower for keyword in keywords):
+        if any(keyword in found for keyword in keywords):
             return intent_type
     
     # 「について」「教えて」がよく使われるので、デフォルトは定義
@@ -108,135 +154,36 @@ def analyze_query_intent(query: str) -> str:
     return "general"
 
 
-def extract_article_info(text: str) -> Tuple[Optional[int], str]:
-    """
-    テキストから条文番号と種類を抽出
-    
-    Returns:
-        (条文番号, 条文タイプ)
+@lru_cache(maxsize=4096)
+def _structural_bonus(
+    intent: str,
+    article_num: Optional[int],
+    article_type: str,
+    mentions_period: bool,
+    has_relevant_content: bool,
+    query_mentions_leave: bool
+) -> Tuple[int, int, str]:
     """
-    # より広範囲で第○条のパターンを探す
-    article_patterns = [
-        r'第([０-９0-9]{1,3})条',  # 数字（全角・半角）
-        r'第([一二三四五六七八九十]{1,3})条',  # 漢数字
-    ]
-    
-    article_num = None
-    # テキスト全体を探索（ただし最初の1000文字まで）
-    search_text = text[:1000]
+    クエリ意図と条文情報から意図ボーナス・条文ボーナスを計算
     
-    for pattern in article_patterns:
-        matches = re.findall(pattern, search_text)
-        if matches:
-            article_str = matches[0]
-            
-            # 条文番号を数値に変換（拡張版）
-            article_num_map = {
-                '１': 1, '２': 2, '３': 3, '４': 4, '５': 5,
-                '６': 6, '７': 7, '８': 8, '９': 9, '１０': 10,
-                '1': 1, '2': 2, '3': 3, '4': 4, '5': 5,
-                '6': 6, '7': 7, '8': 8, '9': 9, '10': 10,
-                '一': 1, '二': 2, '三': 3, '四': 4, '五': 5,
-                '六': 6, '七': 7, '八': 8, '九': 9, '十': 10,
-            }
-            
-            # 2桁以上の数字の処理
-            if article_str.isdigit():
-                article_num = int(article_str)
-            else:
-                article_num = article_num_map.get(article_str, None)
-                
-                # 30番台、40番台などの処理
-                if article_num is None and len(article_str) >= 2:
-                    try:
-                        article_num = int(article_str)
-                    except:
-                        article_num = 99  # デフォルト値
-            
-            if article_num:
-                break
-    
-    # 条文のタイプを判定
-    text_preview = search_text.lower()
-    article_type = "general"
-    
-    # キーワードベースでタイプを判定
-    if '目的' in text_preview[:200]:
-        article_type = "目的"
-    elif '年次有給休暇' in text_preview or '有給休暇' in text_preview:
-        article_type = "休暇"  # 有給休暇関連
-    elif '育児休業' in text_preview or '介護休業' in text_preview:
-        article_type = "休業"  # 休業関連
-    elif '対象' in text_preview or 'できる' in text_preview:
-        article_type = "対象"
-    elif '手続' in text_preview or '申請' in text_preview or '申出' in text_preview:
-        article_type = "手続"
-    elif '期間' in text_preview:
-        article_type = "期間"
-    
-    return (article_num if article_num else None, article_type)
-
-
-def calculate_intelligent_score(
-    query: str,
-    text: str,
-    file_name: str,
-    section: Optional[str],
-    page_no: int
-) -> Tuple[float, List[str], str]:
-    """
-    インテリジェントスコア計算
+    Args:
+        intent: クエリの意図
+        article_num: 条文番号
+        article_type: 条文タイプ
+        mentions_period: ページが期間に関する語を含むか（PAGE_FLAG_PERIOD）
+        has_relevant_content: 検索語がページに出現したか
+        query_mentions_leave: クエリが「休」を含むか
     
     Returns:
-        (スコア, マッチした用語リスト, 関連性タイプ)
-    """
-    text_lower = text.lower()
-    query_lower = query.lower()
-    
-    # 1. クエリ拡張と基本スコア
-    expanded_queries = expand_query(query)
-    max_score = 0
-    matched_terms = []
-    
-    for exp_query in expanded_queries:
-        # 部分一致スコア
-        score = fuzz.partial_ratio(exp_query, text_lower)
-        
-        # 完全一致ボーナス（大幅に増やす）
-        if exp_query in text_lower:
-            score += 50  # 20→50に増加
-            matched_terms.append(exp_query)
-            
-            # 出現回数に応じて追加ボーナス（ただし上限あり）
-            count = text_lower.count(exp_query)
-            if count > 1:
-                score += min(count * 5, 30)  # 最大30点まで
-        
-        # キーワードマッチング
-        keywords = re.findall(r'[\u4e00-\u9fff]+|[a-zA-Z]+', exp_query)
-        for keyword in keywords:
-            if len(keyword) >= 2 and keyword in text_lower:
-                score += 10  # 5→10に増加
-                if keyword not in matched_terms:
-                    matched_terms.append(keyword)
-        
-        max_score = max(max_score, score)
-    
-    # 2. クエリ意図に基づくボーナス
-    intent = analyze_query_intent(query)
-    article_num, article_type = extract_article_info(text)
+        (意図ボーナス, 条文ボーナス, 関連性タイプ)
     
+    引数は少数の値の組み合わせしかとらないため、結果をキャッシュして
+    ページごとの分岐の評価を省く。
+    """
     # 意図と条文タイプのマッチング
     intent_bonus = 0
     relevance_type = "general"
     
-    # キーワードが実際にテキストに含まれているかチェック
-    has_relevant_content = False
-    for term in matched_terms:
-        if term in text_lower:
-            has_relevant_content = True
-            break
-    
     if intent == "definition" or intent == "condition":
         # 定義や条件を求めている場合
         
@@ -244,7 +191,7 @@ def calculate_intelligent_score(
         if article_type == "休暇":
             intent_bonus = 60  # 休暇条文は高ボーナス
             relevance_type = "definition"
-        elif article_type == "休業" and "休" in query_lower:
+        elif article_type == "休業" and query_mentions_leave:
             intent_bonus = 50
             relevance_type = "definition"
         # 第1〜3条の処理（ただし関連内容がある場合のみ）
@@ -275,11 +222,11 @@ def calculate_intelligent_score(
     
     elif intent == "period":
         # 期間を求めている場合
-        if "期間" in text_lower or "日" in text_lower or "ヶ月" in text_lower:
+        if mentions_period:
             intent_bonus = 30
             relevance_type = "period"
     
-    # 3. 条文番号による重み付け（内容の関連性を重視）
+    # 条文番号による重み付け（内容の関連性を重視）
     article_bonus = 0
     if article_num:
         # 関連内容がある場合のみボーナス
@@ -300,7 +247,12 @@ def calculate_intelligent_score(
             if article_num == 1:
                 article_bonus = -20  # 第1条でも関連なければペナルティ
     
-    # 4. ファイル名による調整
+    return intent_bonus, article_bonus, relevance_type
+
+
+@lru_cache(maxsize=1024)
+def _file_bonus(query_lower: str, file_name: str) -> int:
+    """クエリとファイル名の組み合わせによるボーナス"""
     file_bonus = 0
     if "育" in query_lower or "育休" in query_lower:
         if "育児介護" in file_name:
@@ -313,10 +265,106 @@ def calculate_intelligent_score(
         else:
             file_bonus = -20
     
+    return file_bonus
+
+
+def calculate_intelligent_score(
+    query: str,
+    text: str,
+    file_name: str,
+    section: Optional[str],
+    page_no: int,
+    expanded_queries: Optional[Collection[str]] = None,
+    term_matcher: Optional[TermMatcher] = None,
+    base_scores: Optional[Sequence[float]] = None,
+    text_lower: Optional[str] = None,
+    article_info: Optional[Tuple[Optional[int], str]] = None,
+    flags: Optional[int] = None,
+    term_positions: Optional[Dict[str, List[int]]] = None
+) -> Tuple[float, List[str], str]:
+    """
+    インテリジェントスコア計算
+    
+    Args:
+        expanded_queries: 拡張済みクエリ（行ごとの再計算を避けるため呼び出し側で渡す）
+        term_matcher: build_term_matcherの結果（同上）
+        base_scores: expanded_queriesと同じ順の部分一致スコア（一括計算済みの場合）
+        text_lower: 小文字化済みのテキスト（インデックスのtext_lower列）
+        article_info: (条文番号, 条文タイプ)（インデックスのarticle_num・article_type列）
+        flags: ページの特徴（インデックスのflags列）
+        term_positions: term_matcher.find_positions(text_lower)の結果（計算済みの場合）
+    
+    Returns:
+        (スコア, マッチした用語リスト, 関連性タイプ)
+    """
+    if text_lower is None:
+        text_lower = text.lower()
+    if article_info is None:
+        article_info = extract_article_info(text, text_lower)
+    if flags is None:
+        flags = page_flags(text)
+    query_lower = query.lower()
+    
+    # 1. クエリ拡張と基本スコア
+    if expanded_queries is None:
+        expanded_queries = expand_query(query)
+    if term_matcher is None:
+        term_matcher = build_term_matcher(expanded_queries)
+    
+    # 拡張クエリ・キーワードの出現回数をテキスト1回の走査でまとめて数える
+    if term_positions is None:
+        term_positions = term_matcher.find_positions(text_lower)
+    term_counts = count_non_overlapping(term_positions)
+    max_score = 0
+    matched_terms = []
+    
+    for i, exp_query in enumerate(expanded_queries):
+        # 部分一致スコア
+        if base_scores is not None:
+            score = base_scores[i]
+        else:
+            score = fuzz.partial_ratio(exp_query, text_lower)
+        
+        # 完全一致ボーナス（大幅に増やす）
+        if exp_query in term_counts:
+            score += 50  # 20→50に増加
+            matched_terms.append(exp_query)
+            
+            # 出現回数に応じて追加ボーナス（ただし上限あり）
+            count = term_counts[exp_query]
+            if count > 1:
+                score += min(count * 5, 30)  # 最大30点まで
+        
+        # キーワードマッチング（キーワード抽出はクエリごとにキャッシュ）
+        for keyword in _query_keywords(exp_query):
+            if keyword in term_counts:
+                score += 10  # 5→10に増加
+                if keyword not in matched_terms:
+                    matched_terms.append(keyword)
+        
+        max_score = max(max_score, score)
+    
+    # 2. クエリ意図に基づくボーナス
+    intent = analyze_query_intent(query)
+    article_num, article_type = article_info
+    
+    # キーワードが実際にテキストに含まれているかチェック
+    # （matched_termsはテキスト中に出現した語のみ）
+    has_relevant_content = bool(matched_terms)
+    
+    # 意図と条文タイプのマッチング、3. 条文番号による重み付け
+    intent_bonus, article_bonus, relevance_type = _structural_bonus(
+        intent, article_num, article_type, bool(flags & PAGE_FLAG_PERIOD),
+        has_relevant_content, "休" in query_lower
+    )
+    
+    # 4. ファイル名による調整
+    file_bonus = _file_bonus(query_lower, file_name)
+    
     # 5. 単語出現頻度ペナルティ（多すぎる場合は手続き系の可能性）
     frequency_penalty = 0
     for term in matched_terms:
-        count = text_lower.count(term.lower())
+        count = term_counts[term]
         if count > 15:  # 15回以上出現は手続き系の可能性
             if intent != "procedure":  # 手続きを求めていない場合はペナルティ
                 frequency_penalty = -10
@@ -359,45 +407,94 @@ def search_intelligent(
     if not query or not index_path.exists():
         return []
     
-    results = []
-    
     # クエリ意図を分析
     intent = analyze_query_intent(query)
     logger.info(f"Query intent: {intent} for query: {query}")
     
-    with sqlite3.connect(index_path) as db:
-        cursor = db.execute(
-            "SELECT file_name, file_path, page_no, text, section FROM pages"
+    # クエリにのみ依存する値は行ループの外で1回だけ計算
+    # （部分一致スコアの行列と順序を揃えるためタプルにする）
+    expanded_queries = tuple(expand_query(query))
+    term_matcher = build_term_matcher(expanded_queries)
+    
+    def score_row(row: Tuple, base_scores: Sequence[float]) -> Optional[SearchResult]:
+        """1ページ分のスコアを計算（しきい値未満はNone、textは未設定）"""
+        (page_id, file_name, file_path, page_no, section,
+         text_lower, article_num, article_type, flags) = row
+        term_positions = term_matcher.find_positions(text_lower)
+        # 条文情報・フラグは計算済みのため、原文の代わりに小文字版を渡す
+        score, matched_terms, relevance_type = calculate_intelligent_score(
+            query, text_lower, file_name, section, page_no,
+            expanded_queries, term_matcher, base_scores,
+            text_lower, (article_num, article_type), flags, term_positions
+        )
+        if score < min_score:
+            return None
+        return SearchResult(
+            file_name=file_name,
+            file_path=file_path,
+            page_no=page_no,
+            score=score,
+            text="",
+            section=section,
+            matched_terms=matched_terms,
+            relevance_type=relevance_type,
+            term_positions=term_positions,
+            page_id=page_id
+        )
+    
+    # 定義・条件を求めている場合は定義タイプの結果を上位にするため別々に保持する
+    prioritize_definitions = intent in ["definition", "condition"]
+    top_definitions: List[SearchResult] = []
+    top_others: List[SearchResult] = []
+    
+    # 検索用の読み取り専用接続をプロセス内で使い回す
+    db = get_cached_connection(index_path)
+    
+    # FTS5で拡張クエリに一致する候補（使えない場合は全件）のみをスコア計算する
+    # 小文字化・条文情報はインデックス作成時に保存した列を使う
+    for batch in candidate_batches(
+        db, expanded_queries, INTELLIGENT_COLUMNS, FTS_RERANK_LIMIT
+    ):
+        if not batch:
+            continue
+        
+        # 部分一致スコアを (拡張クエリ数 × ページ数) の行列としてC++側で一括計算
+        base_matrix = process.cdist(
+            expanded_queries,
+            [row[5] for row in batch],
+            scorer=fuzz.partial_ratio,
+            dtype=np.float64,
+            workers=-1
         )
         
-        for file_name, file_path, page_no, text, section in cursor:
-            score, matched_terms, relevance_type = calculate_intelligent_score(
-                query, text, file_name, section, page_no
+        scored = map(score_row, batch, base_matrix.T.tolist())
+        hits = [result for result in scored if result is not None]
+        
+        # グループごとにスコア上位top_k件のみ保持
+        # （nlargestは安定なので同点は先に出現したものが優先）
+        if prioritize_definitions:
+            definitions = [r for r in hits if r.relevance_type == "definition"]
+            hits = [r for r in hits if r.relevance_type != "definition"]
+            top_definitions = heapq.nlargest(
+                top_k, top_definitions + definitions, key=lambda x: x.score
             )
-            
-            if score >= min_score:
-                results.append(SearchResult(
-                    file_name=file_name,
-                    file_path=file_path,
-                    page_no=page_no,
-                    score=score,
-                    text=text,
-                    section=section,
-                    matched_terms=matched_terms,
-                    relevance_type=relevance_type
-                ))
-    
-    # スコアでソート
-    results.sort(key=lambda x: x.score, reverse=True)
-    
-    # 関連性タイプが同じものを優先的にグループ化
-    if results and intent in ["definition", "condition"]:
-        # 定義・条件を求めている場合は、それらを上位に
-        definition_results = [r for r in results if r.relevance_type == "definition"]
-        other_results = [r for r in results if r.relevance_type != "definition"]
-        results = definition_results + other_results
-    
-    return results[:top_k]
+        top_others = heapq.nlargest(top_k, top_others + hits, key=lambda x: x.score)
+    
+    # 定義タイプを先に並べて上位top_k件を返す
+    results = (top_definitions + top_others)[:top_k]
+    
+    # 原文は返す上位top_k件のみ取得する
+    texts = fetch_page_texts(db, [r.page_id for r in results])
+    for r in results:
+        r.text = texts[r.page_id]
+    
+    return results
+
+
+@lru_cache(maxsize=256)
+def _term_pattern(term: str) -> "re.Pattern[str]":
+    """ハイライト用の用語パターン（大文字小文字を無視）"""
+    return re.compile(re.escape(term), re.IGNORECASE)
 
 
 def extract_intelligent_snippet(
@@ -405,18 +502,21 @@ def extract_intelligent_snippet(
     query: str,
     matched_terms: List[str],
     relevance_type: str,
-    window: int = 200
+    window: int = 200,
+    term_positions: Optional[Dict[str, List[int]]] = None,
+    text_lower: Optional[str] = None
 ) -> str:
     """
     インテリジェント抜粋生成
     関連性タイプに応じて最適な部分を抽出
-    """
-    text_lower = text.lower()
     
+    term_positionsにスコア計算時の出現位置を渡すとテキストを再走査しない。
+    位置がない用語はtext_lower（未指定なら小文字化して作成）から探す。
+    """
     # 条文の開始位置を探す（定義・条件の場合）
     if relevance_type == "definition":
         # 第○条のパターンを探す
-        article_pattern = re.search(r'第[０-９0-9一二三四五六七八九十]+条', text)
+        article_pattern = _ARTICLE_HEADING_RE.search(text)
         if article_pattern:
             start_pos = article_pattern.start()
             # 条文の終わりまでを含める
@@ -427,7 +527,7 @@ def extract_intelligent_snippet(
             
             # マッチ用語をハイライト
             for term in matched_terms:
-                pattern = re.compile(re.escape(term), re.IGNORECASE)
+                pattern = _term_pattern(term)
                 excerpt = pattern.sub(f"**{term}**", excerpt)
             
             return excerpt
@@ -437,7 +537,12 @@ def extract_intelligent_snippet(
     best_term = query
     
     for term in matched_terms:
-        pos = text_lower.find(term.lower())
+        if term_positions and term_positions.get(term):
+            pos = term_positions[term][0]
+        else:
+            if text_lower is None:
+                text_lower = text.lower()
+            pos = text_lower.find(term.lower())
         if pos != -1:
             best_pos = pos
             best_term = term
@@ -458,7 +563,7 @@ def extract_intelligent_snippet(
     
     # マッチ用語をハイライト
     for term in matched_terms:
-        pattern = re.compile(re.escape(term), re.IGNORECASE)
+        pattern = _term_pattern(term)
         excerpt = pattern.sub(f"**{term}**", excerpt)
     
     return excerpt
@@ -490,7 +595,8 @@ def generate_intelligent_answer(query: str, results: List[SearchResult]) -> Dict
         query,
         best_result.matched_terms,
         best_result.relevance_type,
-        window=250
+        window=250,
+        term_positions=best_result.term_positions
     )
     
     # クエリ意図に応じた追加情報
@@ -4,14 +4,17 @@
 """
 from dataclasses import dataclass
 from typing import List, Optional, Tuple
-import sqlite3
 from pathlib import Path
-from rapidfuzz import fuzz
+import heapq
+import numpy as np
+from rapidfuzz import fuzz, process
 import re
 from loguru import logger
+from .index import FTS_RERANK_LIMIT, PAGE_COLUMNS, candidate_batches, get_cached_connection
+from .term_matcher import TermMatcher
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchHit:
     file_name: str
     file_path: str
@@ -31,28 +34,48 @@ SYNONYMS = {
     "欠勤": ["欠席", "休み"],
 }
 
+# 同義語の見出し語をテキスト1回の走査で検出するマッチャー
+_SYNONYM_MATCHER = TermMatcher(SYNONYMS)
+
+
+# 全角英数字→半角の変換表
+_FULLWIDTH_TRANS = str.maketrans(
+    '０１２３４５６７８９'
+    'ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚ',
+    '0123456789'
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+)
+
+# 正規化で空白に置き換える記号
+_PUNCT_RE = re.compile(r'[、。！？「」『』（）\(\)\[\]【】]')
+
+# 連続する空白
+_WS_RE = re.compile(r'\s+')
+
+# セクション名の条文番号
+_SECTION_ARTICLE_RE = re.compile(r'第[\d一二三四五六七八九十]+条')
+
 
 def _normalize(text: str, expand_synonyms: bool = True) -> str:
     """テキストを正規化"""
     # 全角英数字を半角に変換
-    text = text.translate(str.maketrans('０１２３４５６７８９', '0123456789'))
-    text = text.translate(str.maketrans(
-        'ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚ',
-        'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
-    ))
+    text = text.translate(_FULLWIDTH_TRANS)
     # 小文字化
     text = text.lower()
     # 記号除去
-    text = re.sub(r'[、。！？「」『』（）\(\)\[\]【】]', ' ', text)
+    text = _PUNCT_RE.sub(' ', text)
     # 連続空白を単一スペースに圧縮
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _WS_RE.sub(' ', text).strip()
     
     # 同義語展開
     if expand_synonyms:
-        for base, synonyms in SYNONYMS.items():
-            if base in text:
-                for syn in synonyms:
-                    text = text + " " + syn
+        found = _SYNONYM_MATCHER.found(text)
+        if found:
+            text = " ".join([
+                text,
+                *(syn for base, synonyms in SYNONYMS.items() if base in found
+                  for syn in synonyms)
+            ])
     
     return text
 
@@ -87,28 +110,44 @@ def search_strict(
     query_normalized = _normalize(query)
     hits = []
     
-    with sqlite3.connect(index_path) as db:
-        cursor = db.execute(
-            "SELECT file_name, file_path, page_no, text, section FROM pages"
-        )
-        for file_name, file_path, page_no, text, section in cursor:
-            # ファイル名フィルタリング（重要）
-            if allowed_files and not any(af in file_name for af in allowed_files):
-                logger.debug(f"Skipping {file_name} (not in allowed files)")
-                continue
-            
-            # スコア計算
-            score = fuzz.partial_ratio(query_normalized, _normalize(text))
-            
+    # しきい値判定（上位1〜2件）とtop_k件の返却に必要な件数だけ保持する
+    keep = max(top_k, 2)
+    
+    # 検索用の読み取り専用接続をプロセス内で使い回す
+    db = get_cached_connection(index_path)
+    
+    # FTS5で元のクエリ・正規化済みクエリ（同義語を含む）に一致する候補
+    # （使えない場合は全件）のみをスコア計算する
+    # ファイル名フィルタリング（重要）はSQL側で行い、候補数の上限は絞り込み後に適用する
+    for rows in candidate_batches(
+        db, [query, query_normalized], PAGE_COLUMNS, FTS_RERANK_LIMIT,
+        file_filters=allowed_files or ()
+    ):
+        if not rows:
+            continue
+        
+        # スコア計算（正規化済みテキストとの部分一致をC++側で一括計算）
+        base_scores = process.cdist(
+            [query_normalized],
+            [_normalize(row[3]) for row in rows],
+            scorer=fuzz.partial_ratio,
+            dtype=np.float64,
+            workers=-1
+        )[0].tolist()
+        
+        batch_hits = []
+        for (file_name, file_path, page_no, text, section), score in zip(
+            rows, base_scores
+        ):
             # セクションボーナス
             if section:
                 section_normalized = _normalize(section, expand_synonyms=False)
                 if query_normalized in section_normalized or \
-                   re.search(r'第[\d一二三四五六七八九十]+条', section):
+                   _SECTION_ARTICLE_RE.search(section):
                     score += 5
             
             if score > 0:
-                hits.append(SearchHit(
+                batch_hits.append(SearchHit(
                     file_name=file_name,
                     file_path=file_path,
                     page_no=page_no,
@@ -116,9 +155,9 @@ def search_strict(
                     text=text,
                     section=section
                 ))
-    
-    # スコアでソート
-    hits.sort(key=lambda x: x.score, reverse=True)
+        
+        # スコア上位のみ保持（nlargestは安定なので同点は先に出現したものが優先）
+        hits = heapq.nlargest(keep, hits + batch_hits, key=lambda x: x.score)
     
     # 厳格モードでのしきい値適用
     if strict and hits:
@@ -2,13 +2,13 @@
 LLM統合検索モジュール
 検索結果を基にLLMで自然な回答を生成する統合機能
 """
-from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import InitVar, dataclass, field
+from typing import Callable, Iterator, List, Optional, Dict, Any, Tuple
 from pathlib import Path
-from dataclasses import dataclass
 from loguru import logger
 
 from .search import search, SearchHit
-from .llm_answer import generate_llm_answer
+from .llm_answer import generate_llm_answer, stream_llm_answer
 from .intelligent_answer import generate_intelligent_answer
 from .snippet import make_snippet
 from core.config import AppConfig
@@ -18,14 +18,34 @@ from core.config import AppConfig
 class SearchWithLLMResult:
     """
     LLM統合検索の結果
+
+    sourcesを指定しない場合は、sourcesを初めて参照したときに
+    search_hitsの上位3件から作成する（出典を表示しない呼び出し側ではプレビューを作らない）
     """
     query: str
     answer: str
     search_hits: List[SearchHit]
     snippet: str
     confidence: str
-    sources: List[Dict[str, Any]]
     llm_used: bool
+    sources: InitVar[Optional[List[Dict[str, Any]]]] = None
+    # search_hitsから導出される値のため、比較・表示の対象外
+    _sources: Optional[List[Dict[str, Any]]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self, sources: Optional[List[Dict[str, Any]]]):
+        self._sources = sources
+
+    def _get_sources(self) -> List[Dict[str, Any]]:
+        """ソース情報（上位3件）"""
+        if self._sources is None:
+            self._sources = _prepare_sources(self.search_hits[:3])
+        return self._sources
+
+
+# InitVarと同名のため、dataclassが__init__を作成した後にプロパティとして定義する
+SearchWithLLMResult.sources = property(SearchWithLLMResult._get_sources)
 
 
 def search_with_llm(
@@ -34,7 +54,8 @@ def search_with_llm(
     index_path: Path | str = "./data/index.sqlite",
     min_score: float = 30.0,
     context: Optional[str] = None,
-    use_llm: Optional[bool] = None
+    use_llm: Optional[bool] = None,
+    stream_handler: Optional[Callable[[Iterator[str]], str]] = None
 ) -> SearchWithLLMResult:
     """
     検索とLLM回答生成を統合した関数
@@ -46,6 +67,8 @@ def search_with_llm(
         min_score: 最小スコア閾値
         context: 前の会話の文脈
         use_llm: LLMを使用するか（Noneの場合は設定から判断）
+        stream_handler: LLMの回答の断片を受け取って表示し、連結した回答を返す関数
+            （指定した場合は回答をストリーミング生成する）
 
     Returns:
         SearchWithLLMResult: 統合された検索結果
@@ -88,12 +111,16 @@ def search_with_llm(
     if use_llm:
         try:
             # LLMを使用して回答を生成
-            answer = generate_llm_answer(
-                query=query,
-                search_results=search_hits,
-                context=context,
-                use_llm=True
-            )
+            if stream_handler is not None:
+                # 生成された断片から順に表示し、表示側で連結した回答を受け取る
+                answer = stream_handler(stream_llm_answer(query, search_hits, context))
+            else:
+                answer = generate_llm_answer(
+                    query=query,
+                    search_results=search_hits,
+                    context=context,
+                    use_llm=True
+                )
             llm_used = True
             logger.info("Answer generated using LLM")
         except Exception as e:
@@ -113,16 +140,13 @@ def search_with_llm(
     # 信頼度を判定
     confidence = _determine_confidence(search_hits)
 
-    # ソース情報を整理
-    sources = _prepare_sources(search_hits[:3])
-
+    # ソース情報は参照されたときに上位3件から作成する
     return SearchWithLLMResult(
         query=query,
         answer=answer,
         search_hits=search_hits,
         snippet=snippet,
         confidence=confidence,
-        sources=sources,
         llm_used=llm_used
     )
 
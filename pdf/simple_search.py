@@ -4,11 +4,12 @@ READMEの仕様通り、PDFの該当ページ抜粋+出典を返す
 """
 from dataclasses import dataclass
 from typing import List, Optional
-import sqlite3
 from pathlib import Path
-from rapidfuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
 import re
 from loguru import logger
+from .index import FTS_RERANK_LIMIT, PAGE_COLUMNS, candidate_batches, get_cached_connection
 
 
 @dataclass
@@ -47,15 +48,28 @@ def simple_search(
     
     results = []
     
-    with sqlite3.connect(index_path) as db:
-        cursor = db.execute(
-            "SELECT file_name, file_path, page_no, text, section FROM pages"
-        )
+    # 検索用の読み取り専用接続をプロセス内で使い回す
+    db = get_cached_connection(index_path)
+    
+    # FTS5でクエリに一致する候補（使えない場合は全件）のみをスコア計算する
+    for batch in candidate_batches(
+        db, [query_normalized], PAGE_COLUMNS, FTS_RERANK_LIMIT
+    ):
+        if not batch:
+            continue
         
-        for file_name, file_path, page_no, text, section in cursor:
-            # rapidfuzzによる部分一致スコア計算
-            score = fuzz.partial_ratio(query_normalized, text.lower())
-            
+        # rapidfuzzによる部分一致スコアをバッチ単位でC++側で一括計算
+        base_scores = process.cdist(
+            [query_normalized],
+            [row[3].lower() for row in batch],
+            scorer=fuzz.partial_ratio,
+            dtype=np.float64,
+            workers=-1
+        )[0].tolist()
+        
+        for (file_name, file_path, page_no, text, section), score in zip(
+            batch, base_scores
+        ):
             # トピック固有のボーナス
             # 育休関連の質問は育児介護休業規程を優先
             if "育休" in query_normalized or "育児休" in query_normalized:
@@ -2,7 +2,10 @@
 スニペット生成モジュール
 検索結果から関連部分を抜粋してハイライト表示
 """
+from bisect import bisect_left
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
 from typing import List, Optional, Tuple
 import re
 from loguru import logger
@@ -18,6 +21,47 @@ class Snippet:
     end: int        # 元テキストでの終了位置
 
 
+# 文の区切り文字（extract_windowで採用する優先順）と、いずれかに一致するパターン
+_SEPS = ('。', '．', '\n', '！', '？')
+_SEP_RE = re.compile(r'[。．\n！？]')
+
+# ウィンドウ数がこれ以上で、区切り文字がウィンドウ数より少ない場合は
+# 区切り文字の位置を先に求めてから二分探索する
+# （区切り文字が多いとrfind/findがすぐ見つけるため、位置を求める方が高くつく）
+_SEPARATOR_INDEX_MIN_WINDOWS = 8
+
+
+@lru_cache(maxsize=1024)
+def _compile_positions(query: str, case_sensitive: bool) -> "re.Pattern[str]":
+    """
+    出現位置検索用のクエリパターン
+    
+    クエリの接頭辞と接尾辞が一致する場合（"aa"など）は出現が重なりうるため、
+    先読みパターンにして重なり合う出現もすべて検出する。
+    それ以外は重なりが起きないので、高速な通常のパターンを使う。
+    """
+    flags = 0 if case_sensitive else re.IGNORECASE
+    folded = query if case_sensitive else query.lower()
+    can_overlap = any(folded[:k] == folded[-k:] for k in range(1, len(folded)))
+    if can_overlap:
+        return re.compile(f"(?={re.escape(query)})", flags)
+    return re.compile(re.escape(query), flags)
+
+
+def _positions_pattern(text: str, query: str, case_sensitive: bool) -> Tuple["re.Pattern[str]", str]:
+    """
+    出現位置検索に使うパターンと走査対象のテキスト
+    
+    大文字小文字を区別しない検索は通常IGNORECASEで扱い、小文字化したコピーを作らない。
+    ただしテキストとクエリが共にASCIIで英字を含む場合は、IGNORECASEの照合が
+    1文字ずつになり遅いため、小文字化したテキストを区別ありで検索する
+    （ASCIIでは小文字化で位置も照合結果も変わらない）。
+    """
+    if not case_sensitive and text.isascii() and query.isascii() and query.lower() != query.upper():
+        return _compile_positions(query.lower(), True), text.lower()
+    return _compile_positions(query, case_sensitive), text
+
+
 def find_all_positions(text: str, query: str, case_sensitive: bool = False) -> List[Tuple[int, int]]:
     """
     テキスト内でクエリが出現する全ての位置を検索
@@ -30,32 +74,59 @@ def find_all_positions(text: str, query: str, case_sensitive: bool = False) -> L
     Returns:
         (開始位置, 終了位置)のタプルのリスト
     """
-    positions = []
+    if not text or not query:
+        return []
+    
+    # 全ての出現位置をCレベルの正規表現エンジンで1回の走査で検索
+    pattern, text = _positions_pattern(text, query, case_sensitive)
+    length = len(query)
+    return [(m.start(), m.start() + length) for m in pattern.finditer(text)]
+
+
+def _find_first_positions(text: str, query: str, limit: int) -> List[Tuple[int, int]]:
+    """
+    テキスト内でクエリが出現する位置を先頭から最大limit件検索
+    
+    find_all_positionsと同じ結果の先頭limit件を、テキスト全体を走査せずに返す。
+    
+    Args:
+        text: 検索対象のテキスト
+        query: 検索クエリ（大文字小文字は区別しない）
+        limit: 取得する最大件数
     
+    Returns:
+        (開始位置, 終了位置)のタプルのリスト
+    """
     if not text or not query:
-        return positions
+        return []
     
-    # 大文字小文字の処理
-    search_text = text if case_sensitive else text.lower()
-    search_query = query if case_sensitive else query.lower()
+    pattern, text = _positions_pattern(text, query, False)
+    length = len(query)
+    return [(m.start(), m.start() + length) for m in islice(pattern.finditer(text), limit)]
+
+
+def _separator_offsets(text: str) -> List[List[int]]:
+    """
+    区切り文字ごとの出現位置（昇順）を1回の走査で取得
     
-    # 全ての出現位置を検索
-    start = 0
-    while True:
-        pos = search_text.find(search_query, start)
-        if pos == -1:
-            break
-        positions.append((pos, pos + len(query)))
-        start = pos + 1
+    Args:
+        text: 元のテキスト
     
-    return positions
+    Returns:
+        _SEPSと同じ順の、各区切り文字の位置リスト
+    """
+    offsets = {separator: [] for separator in _SEPS}
+    for m in _SEP_RE.finditer(text):
+        offsets[m.group()].append(m.start())
+    return [offsets[separator] for separator in _SEPS]
 
 
 def extract_window(
     text: str,
     center: int,
     window_size: int,
-    text_length: int
+    text_length: int,
+    separator_offsets: Optional[List[List[int]]] = None
 ) -> Tuple[int, int]:
     """
     中心位置から前後のウィンドウを計算
@@ -65,19 +136,24 @@ def extract_window(
         center: 中心位置
         window_size: ウィンドウサイズ（前後それぞれ）
         text_length: テキスト全体の長さ
+        separator_offsets: _separator_offsets(text)の結果（多数のウィンドウを
+            計算する場合に渡すと、テキストを走査せず二分探索で境界を求める）
     
     Returns:
         (開始位置, 終了位置)のタプル
     """
+    if separator_offsets is not None:
+        return extract_window_fast(separator_offsets, center, window_size, text_length)
+    
     # 開始位置
     start = max(0, center - window_size)
     
     # 文の境界に合わせる（できるだけ文の途中で切らない）
     if start > 0:
-        # 句点を探す
-        for separator in ['。', '．', '\n', '！', '？']:
+        # 句点を探す（探索範囲が[start, center)なので見つかれば必ず範囲内）
+        for separator in _SEPS:
             sep_pos = text.rfind(separator, start, center)
-            if sep_pos != -1 and sep_pos > start - 50:
+            if sep_pos != -1:
                 start = sep_pos + 1
                 break
     
@@ -86,15 +162,74 @@ def extract_window(
     
     # 文の境界に合わせる
     if end < text_length:
-        for separator in ['。', '．', '\n', '！', '？']:
+        for separator in _SEPS:
             sep_pos = text.find(separator, center, end)
-            if sep_pos != -1 and sep_pos < end + 50:
+            if sep_pos != -1:
                 end = sep_pos + 1
                 break
     
     return start, end
 
 
+def extract_window_fast(
+    separator_offsets: List[List[int]],
+    center: int,
+    window_size: int,
+    text_length: int
+) -> Tuple[int, int]:
+    """
+    区切り文字の位置から中心位置の前後のウィンドウを計算
+    
+    extract_windowと同じ範囲を、テキストを走査せず区切り文字の位置リストの
+    二分探索だけで求める。
+    
+    Args:
+        separator_offsets: _separator_offsets(text)の結果
+        center: 中心位置
+        window_size: ウィンドウサイズ（前後それぞれ）
+        text_length: テキスト全体の長さ
+    
+    Returns:
+        (開始位置, 終了位置)のタプル
+    """
+    start = max(0, center - window_size)
+    if start > 0:
+        # [start, center)にある最後の区切り文字（優先順に探す）
+        for offsets in separator_offsets:
+            i = bisect_left(offsets, center)
+            if i and offsets[i - 1] >= start:
+                start = offsets[i - 1] + 1
+                break
+    
+    end = min(text_length, center + window_size)
+    if end < text_length:
+        # [center, end)にある最初の区切り文字（優先順に探す）
+        for offsets in separator_offsets:
+            i = bisect_left(offsets, center)
+            if i < len(offsets) and offsets[i] < end:
+                end = offsets[i] + 1
+                break
+    
+    return start, end
+
+
+@lru_cache(maxsize=1024)
+def _compile_hl(query: str) -> "re.Pattern[str]":
+    """ハイライト用のクエリパターン（大文字小文字を無視。クエリごとに1回だけコンパイル）"""
+    return re.compile(re.escape(query), re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def _compile_hl_any(queries: Tuple[str, ...]) -> "re.Pattern[str]":
+    """
+    複数クエリのいずれかに一致するハイライト用パターン（大文字小文字を無視）
+    
+    他のクエリを含む長いクエリが部分的にハイライトされないよう、長い順に並べる。
+    """
+    ordered = sorted(dict.fromkeys(queries), key=len, reverse=True)
+    return re.compile("|".join(re.escape(query) for query in ordered), re.IGNORECASE)
+
+
 def highlight_text(text: str, query: str, markdown: bool = True) -> str:
     """
     テキスト内のクエリをハイライト
@@ -110,19 +245,27 @@ def highlight_text(text: str, query: str, markdown: bool = True) -> str:
     if not query or not text:
         return text
     
+    # 大文字小文字を無視した置換（パターンはキャッシュ済み）
+    pattern = _compile_hl(query)
+    
     # Markdownの場合は太字でハイライト
     if markdown:
-        # 大文字小文字を無視した置換
-        pattern = re.compile(re.escape(query), re.IGNORECASE)
         highlighted = pattern.sub(lambda m: f"**{m.group()}**", text)
     else:
         # HTMLの場合
-        pattern = re.compile(re.escape(query), re.IGNORECASE)
         highlighted = pattern.sub(lambda m: f"<mark>{m.group()}</mark>", text)
     
     return highlighted
 
 
+def _head_snippet(text: str, max_length: int) -> Snippet:
+    """先頭から抽出したスニペット（収まる場合はテキストをコピーせずそのまま使う）"""
+    text_length = len(text)
+    if text_length <= max_length:
+        return Snippet(text, 0, text_length)
+    return Snippet(text[:max_length] + "…", 0, max_length)
+
+
 def make_snippet(
     text: str,
     query: str,
@@ -154,30 +297,130 @@ def make_snippet(
     
     if not query:
         # クエリがない場合は先頭から抽出
-        excerpt = text[:max_length]
-        if len(text) > max_length:
-            excerpt += "…"
-        return Snippet(excerpt, 0, min(max_length, len(text)))
+        return _head_snippet(text, max_length)
+    
+    if not show_all_matches:
+        # 通常の設定では先頭2件の出現位置しか使わないため、2件見つかった時点で走査を打ち切る
+        positions = _find_first_positions(text, query, 2)
+        return _make_snippet_single(text, query, positions, window, max_length)
     
     # クエリの全出現位置を検索
     positions = find_all_positions(text, query)
+    return _snippet_from_positions(text, query, positions, window, max_length, show_all_matches)
+
+
+def _make_snippet_single(
+    text: str,
+    query: str,
+    positions: List[Tuple[int, int]],
+    window: int,
+    max_length: int
+) -> Snippet:
+    """
+    show_all_matches=False・Markdownハイライトに特化したスニペット生成
+    
+    範囲は最大2つで順序も決まっているため、merge_rangesを使わずに直接マージする。
+    _snippet_from_positions(..., show_all_matches=False)と同じ結果を返す。
     
+    Args:
+        text: 元のテキスト（空でないこと）
+        query: 検索クエリ（空でないこと）
+        positions: 先頭から最大2件の出現位置
+        window: 各マッチの前後に含める文字数
+        max_length: スニペットの最大長
+    
+    Returns:
+        スニペットオブジェクト
+    """
+    if not positions:
+        return _head_snippet(text, max_length)
+    
+    text_length = len(text)
+    pos_start, pos_end = positions[0]
+    start, end = extract_window(text, (pos_start + pos_end) // 2, window, text_length)
+    
+    # 2つ目のマッチも含める（離れている場合）
+    second = None
+    if len(positions) > 1:
+        pos2_start, pos2_end = positions[1]
+        if pos2_start > end + 50:
+            start2, end2 = extract_window(text, (pos2_start + pos2_end) // 2, window // 2, text_length)
+            # 2つ目の範囲は必ず1つ目より後ろから始まる
+            if start2 <= end + 10:
+                end = max(end, end2)
+            else:
+                second = (start2, end2)
+    
+    final_end = second[1] if second is not None else end
+    if max_length <= 0:
+        return Snippet("", start, final_end)
+    
+    # 1つ目の範囲（merge_rangesと同じ10文字の余裕でマージ済み）
+    part_text = text[start:min(end, start + max_length)]
+    if start > 0:
+        part_text = "…" + part_text
+    if end < text_length and (second is None or len(part_text) >= max_length):
+        part_text = part_text + "…"
+    excerpt = part_text
+    
+    # 2つ目の範囲
+    if second is not None and len(part_text) < max_length:
+        start2, end2 = second
+        part2_text = text[start2:min(end2, start2 + max_length - len(part_text))]
+        if end2 < text_length:
+            part2_text = part2_text + "…"
+        excerpt = f"{excerpt} … {part2_text}"
+    
+    return Snippet(highlight_text(excerpt, query), start, final_end)
+
+
+def _snippet_from_positions(
+    text: str,
+    query: str,
+    positions: List[Tuple[int, int]],
+    window: int,
+    max_length: int,
+    show_all_matches: bool,
+    highlight: bool = True
+) -> Snippet:
+    """
+    検索済みの出現位置からスニペットを生成（make_snippetの本体）
+    
+    Args:
+        text: 元のテキスト（空でないこと）
+        query: 検索クエリ（空でないこと）
+        positions: find_all_positions(text, query)と同じ形式の出現位置
+        window: 各マッチの前後に含める文字数
+        max_length: スニペットの最大長
+        show_all_matches: 全てのマッチを表示するか
+        highlight: クエリをハイライトするか（呼び出し側でまとめてハイライトする場合はFalse）
+    
+    Returns:
+        スニペットオブジェクト
+    """
     if not positions:
         # マッチしない場合は先頭から抽出
-        excerpt = text[:max_length]
-        if len(text) > max_length:
-            excerpt += "…"
-        return Snippet(excerpt, 0, min(max_length, len(text)))
+        return _head_snippet(text, max_length)
     
     # スニペットの範囲を計算
     snippets_ranges = []
     
     if show_all_matches:
         # 全てのマッチを含める
-        for pos_start, pos_end in positions:
-            center = (pos_start + pos_end) // 2
-            range_start, range_end = extract_window(text, center, window, len(text))
-            snippets_ranges.append((range_start, range_end))
+        # （マッチが多い場合は区切り文字の位置を1回だけ求めて各ウィンドウで使い回す）
+        text_length = len(text)
+        if len(positions) >= _SEPARATOR_INDEX_MIN_WINDOWS and \
+           sum(map(text.count, _SEPS)) < len(positions):
+            separator_offsets = _separator_offsets(text)
+            for pos_start, pos_end in positions:
+                center = (pos_start + pos_end) // 2
+                snippets_ranges.append(
+                    extract_window_fast(separator_offsets, center, window, text_length)
+                )
+        else:
+            for pos_start, pos_end in positions:
+                center = (pos_start + pos_end) // 2
+                snippets_ranges.append(extract_window(text, center, window, text_length))
     else:
         # 最初のマッチのみ、または最も重要なマッチ
         pos_start, pos_end = positions[0]
@@ -224,7 +467,8 @@ def make_snippet(
     
     # 結合してハイライト
     excerpt = "".join(excerpt_parts)
-    excerpt = highlight_text(excerpt, query)
+    if highlight:
+        excerpt = highlight_text(excerpt, query)
     
     # 最初と最後の位置を記録
     final_start = merged_ranges[0][0] if merged_ranges else 0
@@ -246,20 +490,27 @@ def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
     if not ranges:
         return []
     
-    # ソート
-    sorted_ranges = sorted(ranges, key=lambda x: x[0])
+    # ソート（開始位置が同じ範囲は必ずマージされるため、タプル全体の比較で並べてよい）
+    # show_all_matches=Falseでは範囲は2件以下で昇順に渡されるため、その場合は並べ替えない
+    if len(ranges) <= 2 and ranges[0] <= ranges[-1]:
+        sorted_ranges = ranges
+    else:
+        sorted_ranges = sorted(ranges)
     
-    merged = [sorted_ranges[0]]
+    merged = []
+    last_start, last_end = sorted_ranges[0]
     
-    for current_start, current_end in sorted_ranges[1:]:
-        last_start, last_end = merged[-1]
-        
+    # マージ中の範囲はローカル変数で持ち、確定した時点でタプルにする
+    for current_start, current_end in sorted_ranges:
         # 重複または隣接している場合はマージ
         if current_start <= last_end + 10:  # 10文字の余裕を持たせる
-            merged[-1] = (last_start, max(last_end, current_end))
+            if current_end > last_end:
+                last_end = current_end
         else:
-            merged.append((current_start, current_end))
+            merged.append((last_start, last_end))
+            last_start, last_end = current_start, current_end
     
+    merged.append((last_start, last_end))
     return merged
 
 
@@ -282,11 +533,16 @@ def create_summary_snippet(
     if not text:
         return ""
     
-    # 各クエリのスニペットを生成
+    # 各クエリのスニペットを生成（ハイライトは結合後にまとめて行う）
+    # （先頭2件の出現位置しか使わないため、各クエリの走査は2件見つかった時点で打ち切る）
     snippets = []
     for query in queries:
         if query:
-            snippet = make_snippet(text, query, window=60, max_length=max_length // len(queries))
+            positions = _find_first_positions(text, query, 2)
+            snippet = _snippet_from_positions(
+                text, query, positions, 60, max_length // len(queries), False,
+                highlight=False
+            )
             if snippet.excerpt:
                 snippets.append(snippet.excerpt)
     
@@ -297,5 +553,8 @@ def create_summary_snippet(
             summary += "…"
         return summary
     
-    # スニペットを結合
-    return " … ".join(snippets)[:max_length]
\ No newline at end of file
+    # スニペットを結合し、全クエリを1回の走査でハイライト
+    summary = " … ".join(snippets)
+    pattern = _compile_hl_any(tuple(query for query in queries if query))
+    summary = pattern.sub(lambda m: f"**{m.group()}**", summary)
+    return summary[:max_length]
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+複数語マッチングモジュール
+複数の検索語の出現をテキスト1回の走査でまとめて検出
+"""
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+from loguru import logger
+
+# pyahocorasickがあればAho-Corasick法を使用: pip install pyahocorasick
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    logger.debug("pyahocorasick not installed, using regex term matcher")
+
+
+class TermMatcher:
+    """
+    複数の検索語をまとめて検出するマッチャー
+
+    検索語ごとに `term in text` や `text.count(term)` を繰り返す代わりに、
+    テキストを1回走査するだけで全検索語の出現位置（重なりを含む）を得る。
+    クエリごとに1回構築し、全ページで使い回す。
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = tuple(dict.fromkeys(t for t in terms if t))
+        self._automaton = None
+        self._pattern = None
+
+        if not self.terms:
+            return
+
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for term in self.terms:
+                self._automaton.add_word(term, term)
+            self._automaton.make_automaton()
+        else:
+            # 先読みで各位置の最長一致を取り、その接頭辞になっている語も同位置の一致とみなす
+            ordered = sorted(self.terms, key=len, reverse=True)
+            self._pattern = re.compile(
+                "(?=(" + "|".join(re.escape(t) for t in ordered) + "))"
+            )
+            self._prefixes = {
+                longer: [t for t in self.terms if longer.startswith(t)]
+                for longer in self.terms
+            }
+
+    def find_positions(self, text: str) -> Dict[str, List[int]]:
+        """
+        各検索語の出現開始位置を取得
+
+        Args:
+            text: 検索対象テキスト
+
+        Returns:
+            検索語 → 開始位置リスト（昇順）の辞書。出現しない語は含まれない
+        """
+        positions: Dict[str, List[int]] = defaultdict(list)
+
+        if self._automaton is not None:
+            for end, term in self._automaton.iter(text):
+                positions[term].append(end - len(term) + 1)
+            # 同じ終了位置で複数語が報告されるため開始位置順に整える
+            for starts in positions.values():
+                starts.sort()
+        elif self._pattern is not None:
+            for m in self._pattern.finditer(text):
+                for term in self._prefixes[m.group(1)]:
+                    positions[term].append(m.start())
+
+        return positions
+
+    def found(self, text: str) -> Set[str]:
+        """
+        テキストに含まれる検索語の集合を取得
+
+        Args:
+            text: 検索対象テキスト
+
+        Returns:
+            出現した検索語の集合
+        """
+        if self._automaton is not None:
+            return {term for _, term in self._automaton.iter(text)}
+        return set(self.find_positions(text))
+
+    def counts(self, text: str) -> Dict[str, int]:
+        """
+        各検索語の出現回数を取得（str.countと同じく重ならない出現のみ数える）
+
+        Args:
+            text: 検索対象テキスト
+
+        Returns:
+            検索語 → 出現回数の辞書。出現しない語は含まれない
+        """
+        return count_non_overlapping(self.find_positions(text))
+
+
+def count_non_overlapping(positions: Dict[str, List[int]]) -> Dict[str, int]:
+    """
+    find_positionsの結果から重ならない出現回数を数える
+
+    Args:
+        positions: 検索語 → 開始位置リスト（昇順）の辞書
+
+    Returns:
+        検索語 → 出現回数の辞書（str.countと同じ数え方）
+    """
+    counts: Dict[str, int] = {}
+    for term, starts in positions.items():
+        count = 0
+        next_start = 0
+        for start in starts:
+            if start >= next_start:
+                count += 1
+                next_start = start + len(term)
+        counts[term] = count
+    return counts
@@ -0,0 +1,230 @@
+"""
+インデックス機能のテスト
+"""
+import sqlite3
+import threading
+import pytest
+from pdf.ingest import PageRecord
+from pdf.search_enhanced import search_enhanced
+from pdf.search_improved import search_improved
+from pdf.search_intelligent import search_intelligent
+from pdf.index import (
+    upsert_pages,
+    ensure_schema,
+    build_fts_query,
+    fts_candidates,
+    page_bigrams,
+    get_cached_connection,
+    close_cached_connections,
+)
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    """テスト用のインデックスを作成"""
+    path = tmp_path / "index.sqlite"
+    upsert_pages(path, [
+        PageRecord("育児介護休業規程.pdf", "/a.pdf", 1, "育児休業の申出は一か月前までに行う。", "第5条"),
+        PageRecord("パートタイマー規程.pdf", "/b.pdf", 1, "パートタイマーの勤務時間は一日六時間とする。", "第3条"),
+        PageRecord("就業規則.pdf", "/c.pdf", 2, "時間外労働は月四十五時間を上限とする。", "第10条"),
+    ])
+    return path
+
+
+class TestBuildFtsQuery:
+    """MATCH式生成のテスト"""
+
+    def test_build_fts_query_joins_terms_with_or(self):
+        """語をORで連結するテスト"""
+        assert build_fts_query(["パートの勤務時間"]) == '"パート" OR "勤務時間"'
+
+    def test_build_fts_query_skips_short_terms(self):
+        """trigramで扱えない短い語の除外テスト"""
+        assert build_fts_query(["育休の条件"]) is None
+
+
+class TestFtsCandidates:
+    """FTS5候補取得のテスト"""
+
+    def test_fts_candidates_returns_matching_pages(self, index_path):
+        """一致するページのみ取得するテスト"""
+        with sqlite3.connect(index_path) as db:
+            rows = fts_candidates(db, ["時間外労働の上限"])
+        assert [row[0] for row in rows] == ["就業規則.pdf"]
+
+    def test_fts_candidates_stays_in_sync_after_reindex(self, index_path):
+        """再インデックス後も索引が同期されるテスト"""
+        upsert_pages(index_path, [
+            PageRecord("新規程.pdf", "/d.pdf", 1, "慶弔休暇は三日とする。", None),
+        ])
+        with sqlite3.connect(index_path) as db:
+            assert fts_candidates(db, ["育児休業"]) == []
+            assert len(fts_candidates(db, ["慶弔休暇"])) == 1
+
+    def test_fts_candidates_uses_like_for_short_terms(self, index_path):
+        """3文字未満の語のみの場合はLIKEで取得するテスト"""
+        with sqlite3.connect(index_path) as db:
+            rows = fts_candidates(db, ["上限"])
+        assert [row[0] for row in rows] == ["就業規則.pdf"]
+
+    def test_fts_candidates_keeps_short_term_pages_alongside_match(self, index_path):
+        """3文字以上の語がMATCHで一致しても、短い語のみを含むページを取得するテスト"""
+        with sqlite3.connect(index_path) as db:
+            rows = fts_candidates(db, ["育児休業", "上限"])
+        assert [row[0] for row in rows] == ["育児介護休業規程.pdf", "就業規則.pdf"]
+
+    def test_fts_candidates_filters_file_names(self, index_path):
+        """ファイル名の部分文字列で絞り込むテスト（LIKEでの取得も同様）"""
+        with sqlite3.connect(index_path) as db:
+            assert fts_candidates(db, ["時間"], file_filters=("パート",))[0][0] == "パートタイマー規程.pdf"
+            assert fts_candidates(db, ["時間外労働"], file_filters=("パート",)) == []
+
+    def test_fts_candidates_falls_back_to_like_when_match_is_empty(self, index_path):
+        """MATCHが0件の日本語クエリはLIKEで再検索するテスト"""
+        with sqlite3.connect(index_path) as db:
+            rows = fts_candidates(db, ["勤務時間帯の上限"])
+        assert [row[0] for row in rows] == ["就業規則.pdf"]
+
+
+class TestBigramPostings:
+    """bigram転置索引のテスト"""
+
+    def test_page_bigrams_stays_within_term_runs(self):
+        """検索語になりうる文字の連続の内側のみ抽出するテスト"""
+        assert page_bigrams("育休の申出", None) == {"育休", "申出"}
+
+    def test_fts_candidates_narrows_short_terms_with_postings(self, index_path):
+        """bigram索引で絞り込んでもLIKEと同じページを取得するテスト"""
+        with sqlite3.connect(index_path) as db:
+            assert db.execute("SELECT COUNT(*) FROM bigram_postings").fetchone()[0] > 0
+            rows = fts_candidates(db, ["上限", "勤務"])
+        assert [row[0] for row in rows] == ["パートタイマー規程.pdf", "就業規則.pdf"]
+
+
+class TestLowerColumns:
+    """小文字化済みの列のテスト"""
+
+    def test_upsert_pages_stores_lowercase_text(self, tmp_path):
+        """保存時に小文字化済みの列も書き込むテスト"""
+        path = tmp_path / "index.sqlite"
+        upsert_pages(path, [PageRecord("規程.pdf", "/a.pdf", 1, "ＡＢＣ Rule", "Section")])
+        with sqlite3.connect(path) as db:
+            row = db.execute("SELECT text_lower, section_lower FROM pages").fetchone()
+        assert row == ("ａｂｃ rule", "section")
+
+    def test_ensure_schema_fills_lowercase_columns_of_existing_db(self, tmp_path):
+        """列のない既存DBに列を追加して値を埋めるテスト"""
+        path = tmp_path / "index.sqlite"
+        with sqlite3.connect(path) as db:
+            db.execute("""
+                CREATE TABLE pages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_name TEXT NOT NULL, file_path TEXT NOT NULL,
+                    page_no INTEGER NOT NULL, text TEXT NOT NULL, section TEXT,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(file_name, page_no)
+                )
+            """)
+            db.execute(
+                "INSERT INTO pages (file_name, file_path, page_no, text, section) "
+                "VALUES ('規程.pdf', '/a.pdf', 1, 'ＡＢＣ Rule', NULL)"
+            )
+            ensure_schema(db)
+            row = db.execute("SELECT text_lower, section_lower FROM pages").fetchone()
+        assert row == ("ａｂｃ rule", None)
+
+
+class TestArticleColumns:
+    """条文情報の列のテスト"""
+
+    def test_upsert_pages_stores_article_info(self, tmp_path):
+        """保存時に条文番号・タイプ・フラグも書き込むテスト"""
+        path = tmp_path / "index.sqlite"
+        upsert_pages(path, [
+            PageRecord("規程.pdf", "/a.pdf", 1, "第5条 申出は一ヶ月前までに行う。", None),
+        ])
+        with sqlite3.connect(path) as db:
+            row = db.execute("SELECT article_num, article_type, flags FROM pages").fetchone()
+        assert row == (5, "手続", 1)
+
+
+class TestCachedConnection:
+    """読み取り専用接続キャッシュのテスト"""
+
+    def test_cached_connection_shared_across_path_spellings(self, index_path, monkeypatch):
+        """表記の異なる同じパスで接続を共有するテスト"""
+        monkeypatch.chdir(index_path.parent)
+        try:
+            conn = get_cached_connection("index.sqlite")
+            assert get_cached_connection("./index.sqlite") is conn
+            assert get_cached_connection(index_path) is conn
+        finally:
+            close_cached_connections()
+
+    def test_cached_connection_is_per_thread(self, index_path):
+        """スレッドごとに別の接続を使うテスト"""
+        others = []
+        thread = threading.Thread(target=lambda: others.append(get_cached_connection(index_path)))
+        thread.start()
+        thread.join()
+        try:
+            assert get_cached_connection(index_path) is not others[0]
+        finally:
+            close_cached_connections()
+
+    def test_upsert_pages_keeps_open_connections_usable(self, index_path):
+        """再インデックスで使用中の接続を閉じず、次回の取得で開き直すテスト"""
+        try:
+            conn = get_cached_connection(index_path)
+            upsert_pages(index_path, [
+                PageRecord("新規程.pdf", "/d.pdf", 1, "慶弔休暇は三日とする。", None),
+            ])
+            assert conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0] == 1
+            assert get_cached_connection(index_path) is not conn
+        finally:
+            close_cached_connections()
+
+
+@pytest.fixture
+def baseline_index_path(tmp_path):
+    """追加列・FTS索引のない以前の形式のインデックスを作成"""
+    path = tmp_path / "baseline.sqlite"
+    with sqlite3.connect(path) as db:
+        db.executescript("""
+            CREATE TABLE pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_name TEXT NOT NULL, file_path TEXT NOT NULL,
+                page_no INTEGER NOT NULL, text TEXT NOT NULL, section TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(file_name, page_no)
+            );
+            CREATE TABLE metadata (
+                key TEXT PRIMARY KEY, value TEXT,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        db.execute(
+            "INSERT INTO pages (file_name, file_path, page_no, text, section) "
+            "VALUES ('育児介護休業規程.pdf', '/a.pdf', 1, '第5条 育児休業の申出は一か月前までに行う。', '第5条')"
+        )
+    yield path
+    close_cached_connections()
+
+
+class TestSchemaMigration:
+    """以前の形式のインデックスを検索するテスト"""
+
+    @pytest.mark.parametrize("search", [search_enhanced, search_improved, search_intelligent])
+    def test_search_reads_baseline_index_without_writing(self, baseline_index_path, search):
+        """不足している列を検索時に計算し、DBには書き込まないテスト"""
+        results = search("育児休業の申出", baseline_index_path)
+        assert [r.file_name for r in results] == ["育児介護休業規程.pdf"]
+        with sqlite3.connect(baseline_index_path) as db:
+            columns = {row[1] for row in db.execute("PRAGMA table_info(pages)")}
+        assert "text_lower" not in columns and "article_num" not in columns
+
+    def test_cached_connection_computes_missing_columns(self, baseline_index_path):
+        """不足している列を本文から計算して取得するテスト"""
+        db = get_cached_connection(baseline_index_path)
+        rows = fts_candidates(db, ["育児休業"], columns=("text_lower", "article_num", "article_type"))
+        assert rows == [("第5条 育児休業の申出は一か月前までに行う。", 5, "休業")]
@@ -0,0 +1,118 @@
+"""
+LLM回答生成（ストリーミング）のテスト
+"""
+from types import SimpleNamespace
+import pytest
+from pdf import search_with_llm as search_with_llm_module
+from pdf.ingest import PageRecord
+from pdf.index import upsert_pages, close_cached_connections
+from pdf.llm_answer import LLMAnswerGenerator, LLMConfig
+from pdf.search import SearchHit
+from pdf.search_with_llm import search_with_llm
+
+
+def _chunk(content):
+    """ストリーミングAPIが返す断片"""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+def _stream(*contents, error=None):
+    """断片を順に返し、errorを指定した場合は最後に送出するストリーム"""
+    for content in contents:
+        yield _chunk(content)
+    if error is not None:
+        raise error
+
+
+@pytest.fixture
+def generator():
+    """ストリーミングAPIをモックに差し替えた回答生成器"""
+    generator = LLMAnswerGenerator(LLMConfig(provider="openai", api_key="test"))
+    generator.requests = []
+
+    def create(**kwargs):
+        generator.requests.append(kwargs)
+        return generator.stream
+
+    generator.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return generator
+
+
+@pytest.fixture
+def hits():
+    """テスト用の検索結果"""
+    return [SearchHit("就業規則.pdf", 2, 80.0, "時間外労働は月四十五時間を上限とする。", "第10条", "/c.pdf")]
+
+
+def test_generate_answer_stream_yields_chunks(generator, hits):
+    """ストリーミングAPIの断片を順に返すテスト"""
+    generator.stream = _stream("時間外労働は", None, "月45時間までです。")
+
+    chunks = list(generator.generate_answer_stream("残業の上限", hits))
+
+    assert chunks == ["時間外労働は", "月45時間までです。"]
+    assert generator.requests[0]["stream"] is True
+
+
+def test_generate_answer_stream_raises_mid_stream_error(generator, hits):
+    """断片を返した後のエラーは途中までの回答を完結させずに送出するテスト"""
+    generator.stream = _stream("時間外労働は", error=RuntimeError("connection reset"))
+    chunks = []
+
+    with pytest.raises(RuntimeError):
+        for chunk in generator.generate_answer_stream("残業の上限", hits):
+            chunks.append(chunk)
+
+    assert chunks == ["時間外労働は"]
+
+
+def test_generate_answer_stream_falls_back_before_first_chunk(generator, hits):
+    """最初の断片の前のエラーは簡易的な回答にフォールバックするテスト"""
+    generator.stream = _stream(error=RuntimeError("rate limited"))
+
+    chunks = list(generator.generate_answer_stream("残業の上限", hits))
+
+    assert len(chunks) == 1
+    assert "就業規則.pdf - ページ 2" in chunks[0]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    """テスト用のインデックスを作成"""
+    path = tmp_path / "index.sqlite"
+    upsert_pages(path, [
+        PageRecord("就業規則.pdf", "/c.pdf", 2, "時間外労働は月四十五時間を上限とする。", "第10条"),
+    ])
+    yield path
+    close_cached_connections()
+
+
+def test_search_with_llm_streams_answer_to_handler(generator, index_path, monkeypatch):
+    """stream_handlerに断片を渡し、連結した回答を結果にするテスト"""
+    monkeypatch.setattr("pdf.llm_answer.get_llm_generator", lambda: generator)
+    generator.stream = _stream("月45時間", "までです。")
+    received = []
+
+    def handler(chunks):
+        received.extend(chunks)
+        return "".join(received)
+
+    result = search_with_llm("時間外労働の上限", index_path=index_path, use_llm=True, stream_handler=handler)
+
+    assert received == ["月45時間", "までです。"]
+    assert (result.answer, result.llm_used) == ("月45時間までです。", True)
+
+
+def test_search_with_llm_falls_back_on_mid_stream_error(generator, index_path, monkeypatch):
+    """回答の途中でエラーになった場合はルールベースの回答に切り替えるテスト"""
+    monkeypatch.setattr("pdf.llm_answer.get_llm_generator", lambda: generator)
+    monkeypatch.setattr(
+        search_with_llm_module, "generate_intelligent_answer", lambda *args: "ルールベースの回答"
+    )
+    generator.stream = _stream("月45時間", error=RuntimeError("connection reset"))
+
+    result = search_with_llm(
+        "時間外労働の上限", index_path=index_path, use_llm=True, stream_handler="".join
+    )
+
+    assert (result.answer, result.llm_used) == ("ルールベースの回答", False)
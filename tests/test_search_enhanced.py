@@ -0,0 +1,73 @@
+"""
+強化検索機能のテスト
+"""
+import os
+import pytest
+from pdf import index
+from pdf import search_enhanced as search_enhanced_module
+from pdf.ingest import PageRecord
+from pdf.index import upsert_pages, close_cached_connections
+from pdf.search_enhanced import search_enhanced
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    """テスト用のインデックスを作成"""
+    path = tmp_path / "index.sqlite"
+    upsert_pages(path, [
+        PageRecord("育児介護休業規程.pdf", "/a.pdf", 1, "育児休業の申出は一か月前までに行う。", "第5条"),
+        PageRecord("育児介護休業規程.pdf", "/a.pdf", 2, "育休中の賃金は支給しない。", "第9条"),
+        PageRecord("就業規則.pdf", "/c.pdf", 2, "時間外労働は月四十五時間を上限とする。", "第10条"),
+        PageRecord("就業規則.pdf", "/c.pdf", 3, "残業の上限を超える場合は前日までに通知する。", "第11条"),
+        PageRecord("パートタイマー規程.pdf", "/b.pdf", 1, "パートタイマーの勤務時間は一日六時間とする。", "第3条"),
+    ])
+    yield path
+    close_cached_connections()
+
+
+def test_search_enhanced_cache_returns_copies(tmp_path):
+    """キャッシュ済みの結果を呼び出し側が変更しても次の検索に影響しないテスト"""
+    path = tmp_path / "index.sqlite"
+    upsert_pages(path, [
+        PageRecord("育児介護休業規程.pdf", "/a.pdf", 1, "育児休業の申出は一か月前までに行う。", "第5条"),
+    ])
+    try:
+        first = search_enhanced("育児休業", path)
+        expected = (first[0].score, list(first[0].matched_terms))
+        first[0].score = 0
+        first[0].matched_terms.append("変更")
+        second = search_enhanced("育児休業", path)
+    finally:
+        close_cached_connections()
+    assert (second[0].score, second[0].matched_terms) == expected
+
+
+def test_search_enhanced_cache_is_per_index(tmp_path):
+    """更新時刻が同じでも別のインデックスの結果をキャッシュから返さないテスト"""
+    first_path = tmp_path / "first.sqlite"
+    second_path = tmp_path / "second.sqlite"
+    upsert_pages(first_path, [PageRecord("育児介護休業規程.pdf", "/a.pdf", 1, "育児休業の申出", None)])
+    upsert_pages(second_path, [PageRecord("就業規則.pdf", "/c.pdf", 1, "育児休業の申出", None)])
+    mtime_ns = first_path.stat().st_mtime_ns
+    os.utime(second_path, ns=(mtime_ns, mtime_ns))
+    try:
+        first = search_enhanced("育児休業", first_path)
+        second = search_enhanced("育児休業", second_path)
+    finally:
+        close_cached_connections()
+    assert [r.file_name for r in first] == ["育児介護休業規程.pdf"]
+    assert [r.file_name for r in second] == ["就業規則.pdf"]
+
+
+@pytest.mark.parametrize("query", ["育休", "時間外勤務", "残業の上限"])
+def test_fts_candidates_keep_full_scan_top_hit(index_path, monkeypatch, query):
+    """FTS5の候補から求めた1位が全件走査の1位と同じになるテスト（短い語・同義語・混在）"""
+    top = search_enhanced(query, index_path)[0]
+
+    search_enhanced_module._result_cache.clear()
+    monkeypatch.setattr(index, "fts_candidates", lambda *args, **kwargs: None)
+    full_scan_top = search_enhanced(query, index_path)[0]
+
+    assert (top.file_name, top.page_no, top.score) == (
+        full_scan_top.file_name, full_scan_top.page_no, full_scan_top.score
+    )
@@ -0,0 +1,53 @@
+"""
+改善検索機能のテスト
+"""
+import pytest
+from pdf import search_improved as search_improved_module
+from pdf.ingest import PageRecord
+from pdf.index import upsert_pages, close_cached_connections, get_cached_connection
+from pdf.search_improved import search_improved
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    """テスト用のインデックスを作成"""
+    path = tmp_path / "index.sqlite"
+    upsert_pages(path, [
+        PageRecord("育児介護休業規程.pdf", "/a.pdf", 1, "育児休業の申出は一か月前までに行う。", "第5条"),
+        PageRecord("育児介護休業規程.pdf", "/a.pdf", 2, "育休中の賃金は支給しない。", "第9条"),
+        PageRecord("就業規則.pdf", "/c.pdf", 2, "時間外労働は月四十五時間を上限とする。", "第10条"),
+        PageRecord("就業規則.pdf", "/c.pdf", 3, "残業の上限を超える場合は前日までに通知する。", "第11条"),
+        PageRecord("パートタイマー規程.pdf", "/b.pdf", 1, "パートタイマーの勤務時間は一日六時間とする。", "第3条"),
+    ])
+    yield path
+    close_cached_connections()
+
+
+def test_full_scan_registers_udf_once_per_connection(index_path, monkeypatch):
+    """全件走査のスコア関数を接続ごとに1回だけ登録するテスト"""
+    monkeypatch.setattr(search_improved_module, "fts_candidates", lambda *args, **kwargs: None)
+    db = get_cached_connection(index_path)
+    registered = []
+    monkeypatch.setattr(
+        type(db), "create_function", lambda self, *args, **kwargs: registered.append(args)
+    )
+
+    first = search_improved("育児休業の申出", index_path)
+    second = search_improved("時間外労働の上限", index_path)
+
+    assert registered == []
+    assert [hit.file_name for hit in first][:1] == ["育児介護休業規程.pdf"]
+    assert [hit.file_name for hit in second][:1] == ["就業規則.pdf"]
+
+
+@pytest.mark.parametrize("query", ["育休", "時間外労働", "残業の上限"])
+def test_fts_candidates_keep_full_scan_top_hit(index_path, monkeypatch, query):
+    """FTS5の候補から求めた1位が全件走査の1位と同じになるテスト（短い語・長い語・混在）"""
+    top = search_improved(query, index_path)[0]
+
+    monkeypatch.setattr(search_improved_module, "fts_candidates", lambda *args, **kwargs: None)
+    full_scan_top = search_improved(query, index_path)[0]
+
+    assert (top.file_name, top.page_no, top.score) == (
+        full_scan_top.file_name, full_scan_top.page_no, full_scan_top.score
+    )
@@ -0,0 +1,44 @@
+"""
+インテリジェント検索機能のテスト
+"""
+import pytest
+from pdf.ingest import PageRecord
+from pdf.index import upsert_pages, close_cached_connections
+from pdf.search_intelligent import search_intelligent
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    """定義タイプの条文と、スコアは高いが一般タイプのページを含むインデックスを作成"""
+    path = tmp_path / "index.sqlite"
+    upsert_pages(path, [
+        PageRecord("育児介護休業規程.pdf", "/a.pdf", 5, "育児休暇の例。" * 6, "様式"),
+        PageRecord("給与規程.pdf", "/b.pdf", 60, "第60条 賞与の算定では育児休業の期間を除く。", "第60条"),
+        PageRecord("給与規程.pdf", "/b.pdf", 1, "第5条 基本給は月給制とする。", "第5条"),
+    ])
+    yield path
+    close_cached_connections()
+
+
+def test_definition_query_ranks_definitions_first(index_path):
+    """定義を求めるクエリでは、スコアが低くても定義タイプの結果を先に返すテスト"""
+    results = search_intelligent("育休とは", index_path, top_k=3)
+    assert [(r.page_no, r.relevance_type) for r in results] == [
+        (60, "definition"), (5, "general")
+    ]
+    assert results[0].score < results[1].score
+    # 原文は返す結果の分だけ後から取得される
+    assert results[0].text.startswith("第60条")
+
+
+def test_definition_query_respects_top_k(index_path):
+    """定義タイプの優先後にtop_k件で打ち切るテスト"""
+    results = search_intelligent("育休とは", index_path, top_k=1)
+    assert [r.page_no for r in results] == [60]
+
+
+def test_general_query_ranks_by_score(index_path):
+    """定義を求めないクエリではスコア順に返すテスト"""
+    results = search_intelligent("育休の例", index_path, top_k=3)
+    assert [r.page_no for r in results] == [5, 60]
+    assert results[0].text == "育児休暇の例。" * 6
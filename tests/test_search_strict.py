@@ -0,0 +1,50 @@
+"""
+厳格検索機能のテスト
+"""
+import pytest
+import pdf.search_strict as search_strict_module
+from pdf.ingest import PageRecord
+from pdf.index import upsert_pages, close_cached_connections
+from pdf.search_strict import search_strict
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    """許可ファイル以外にも一致するページを含むインデックスを作成"""
+    path = tmp_path / "index.sqlite"
+    upsert_pages(path, [
+        PageRecord("育児介護休業規程.pdf", "/a.pdf", 1, "時間外労働の制限。時間外労働は月二十四時間まで。", "第18条"),
+        PageRecord("パートタイマー規程.pdf", "/b.pdf", 1, "時間外労働は命じない。", "第7条"),
+        PageRecord("就業規則.pdf", "/c.pdf", 2, "休日の振替について定める。時間外労働は月四十五時間を上限とする。", "第10条"),
+    ])
+    yield path
+    close_cached_connections()
+
+
+def test_search_strict_filters_files_before_candidate_limit(index_path, monkeypatch):
+    """候補数の上限より先に許可ファイルで絞り込むテスト"""
+    monkeypatch.setattr(search_strict_module, "FTS_RERANK_LIMIT", 1)
+    hits = search_strict("時間外労働", index_path=index_path, strict=False)
+    assert [h.file_name for h in hits] == ["就業規則.pdf"]
+
+
+def test_search_strict_without_file_filter(index_path):
+    """allowed_filesを空にすると全ファイルを対象にするテスト"""
+    hits = search_strict("時間外労働", index_path=index_path, allowed_files=(), strict=False)
+    assert {h.file_name for h in hits} == {
+        "育児介護休業規程.pdf", "パートタイマー規程.pdf", "就業規則.pdf"
+    }
+
+
+def test_search_strict_returns_top_k_by_score(index_path):
+    """スコア順にtop_k件を返すテスト"""
+    hits = search_strict("時間外労働の上限", top_k=2, index_path=index_path,
+                         allowed_files=(), strict=False)
+    assert [h.file_name for h in hits] == ["育児介護休業規程.pdf", "パートタイマー規程.pdf"]
+    assert hits[0].score >= hits[1].score
+
+
+def test_search_strict_threshold_keeps_single_high_score_hit(index_path):
+    """厳格モードでは最上位のスコアが80以上なら1件のみ返すテスト"""
+    hits = search_strict("時間外労働の上限", top_k=3, index_path=index_path, allowed_files=())
+    assert [h.file_name for h in hits] == ["育児介護休業規程.pdf"]
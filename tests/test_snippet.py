@@ -5,9 +5,12 @@ import pytest
 from pdf.snippet import (
     find_all_positions,
     extract_window,
+    extract_window_fast,
+    _separator_offsets,
     highlight_text,
     make_snippet,
     merge_ranges,
+    create_summary_snippet,
     Snippet
 )
 
@@ -35,6 +38,11 @@ class TestFindPositions:
         """マッチしない場合のテスト"""
         positions = find_all_positions("hello world", "xyz")
         assert len(positions) == 0
+    
+    def test_find_overlapping_positions(self):
+        """重なり合う出現も全て検出するテスト"""
+        positions = find_all_positions("AAAA", "aa")
+        assert positions == [(0, 2), (1, 3), (2, 4)]
 
 
 class TestExtractWindow:
@@ -61,6 +69,14 @@ class TestExtractWindow:
         start, end = extract_window(text, 95, 10, 100)
         assert start < 95
         assert end == 100
+    
+    def test_extract_window_with_separator_offsets(self):
+        """区切り文字の位置を渡しても同じ範囲になるテスト"""
+        text = "一文目。二文目！三文目\n四文目。五文目？六文目" * 5
+        offsets = _separator_offsets(text)
+        for center in range(0, len(text), 7):
+            assert extract_window_fast(offsets, center, 8, len(text)) == \
+                extract_window(text, center, 8, len(text))
 
 
 class TestHighlightText:
@@ -112,6 +128,18 @@ class TestMakeSnippet:
         assert snippet.excerpt.startswith(text[:20]) or snippet.excerpt.startswith(text)
 
 
+class TestCreateSummarySnippet:
+    """サマリースニペット生成のテスト"""
+    
+    def test_summary_highlights_all_queries(self):
+        """全クエリを長い語を優先してハイライトするテスト"""
+        text = "有給休暇の申請は前日までに行う。"
+        summary = create_summary_snippet(text, ["有給", "有給休暇", "申請"])
+        assert "**有給休暇**" in summary
+        assert "**申請**" in summary
+        assert "**有給**" not in summary
+
+
 class TestMergeRanges:
     """範囲マージのテスト"""
     
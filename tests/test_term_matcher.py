@@ -0,0 +1,43 @@
+"""
+複数語マッチング機能のテスト
+"""
+import pdf.term_matcher as term_matcher
+from pdf.term_matcher import TermMatcher
+
+
+TERMS = ["時間外労働の上限", "時間外労働", "上限", "労働"]
+TEXT = "時間外労働の上限は月四十五時間。時間外労働は届出が必要。"
+
+
+class TestTermMatcher:
+    """TermMatcherのテスト"""
+
+    def test_find_positions_includes_overlaps(self):
+        """重なった出現も含めて位置を取得するテスト"""
+        positions = TermMatcher(TERMS).find_positions(TEXT)
+        assert positions["時間外労働の上限"] == [0]
+        assert positions["時間外労働"] == [0, 16]
+        assert positions["労働"] == [3, 19]
+        assert positions["上限"] == [6]
+
+    def test_found_returns_present_terms_only(self):
+        """出現した語のみ返すテスト"""
+        found = TermMatcher(TERMS + ["育児休業"]).found(TEXT)
+        assert found == set(TERMS)
+
+    def test_regex_fallback_matches_automaton(self, monkeypatch):
+        """pyahocorasickがない場合も同じ結果になるテスト"""
+        expected = TermMatcher(TERMS).find_positions(TEXT)
+        monkeypatch.setattr(term_matcher, "AHOCORASICK_AVAILABLE", False)
+        assert TermMatcher(TERMS).find_positions(TEXT) == expected
+
+    def test_empty_terms(self):
+        """検索語がない場合のテスト"""
+        assert TermMatcher([]).found(TEXT) == set()
+
+    def test_counts_match_str_count(self):
+        """重ならない出現のみ数え、str.countと一致するテスト"""
+        terms = TERMS + ["ああ"]
+        text = TEXT + "あああああ"
+        counts = TermMatcher(terms).counts(text)
+        assert counts == {t: text.count(t) for t in terms if t in text}